@@ -1,15 +1,32 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import os
-import shutil
+import time
+import asyncio
+import json
 import logging
+from fastapi.concurrency import run_in_threadpool
 
 from services.pdf_loader import PDFLoader
 from services.preprocess import Preprocess
 from services.embeddings import EmbeddingService
-from services.vector_store import Storage
+from services.embedding_pool import EmbeddingPool
+from services.storage_base import create_storage
 from services.llm_service import LLMService
-from models import SearchRequest, SearchResult, PDFUploadResponse, AskRequest, AskResponse, ModelsResponse
+from services.ingestion import IngestionPipeline
+from services.embedding_cache import EmbeddingCache
+from services.answer_cache import AnswerCache
+from services.context_packer import ContextPacker
+from services.model_catalog import ModelCatalog
+from services.jobs import JobManager
+from services.batcher import EmbeddingBatcher
+from services.cache import LRUCache, normalize_query
+from services.uploads import MultipartReceiver, UploadTooLarge, write_stream, iter_zip_pdfs, remove_stored_files
+from services.admission import AdmissionController, Overloaded, SlotStreamingResponse
+from services.hashing import hash_text
+from services.metrics import REGISTRY, HTTP_REQUEST_SECONDS, QUEUE_DEPTH, ADMISSION_REJECTED, request_timings, query_stage
+from models import SearchRequest, SearchResult, BatchSearchRequest, BatchSearchResult, PDFUploadResponse, BatchUploadResponse, UploadedFile, DocumentInfo, DocumentsResponse, AskRequest, AskResponse, ModelInfo, ModelsResponse, JobStatus
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -32,19 +49,201 @@ app.add_middleware(
 # Initialize
 loader = PDFLoader()
 preprocess = Preprocess()
-embedder = EmbeddingService()
-storage = Storage()
-llmservice = LLMService()
+embedder = EmbeddingService(cache_dir=os.getenv("MODEL_CACHE_DIR", "./model_cache"))
+storage = create_storage(
+    os.getenv("VECTOR_BACKEND", "chroma"),
+    shards=int(os.getenv("VECTOR_SHARDS", "1")),
+    shard_key=os.getenv("VECTOR_SHARD_KEY", "document_id")
+)
+llmservice = LLMService(base_url=os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"))
+model_catalog = ModelCatalog(
+    llmservice,
+    ttl_seconds=float(os.getenv("MODEL_CATALOG_TTL", "3600")),
+    retry_seconds=float(os.getenv("MODEL_CATALOG_RETRY", "30"))
+)
+embedding_cache = EmbeddingCache(os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache/embeddings.sqlite3"))
+# With EMBEDDING_WORKERS set, ingestion embeds in that many worker processes
+embedding_workers = int(os.getenv("EMBEDDING_WORKERS", "0"))
+embedding_pool = EmbeddingPool(
+    embedder.model_name,
+    cache_dir=embedder.cache_dir,
+    workers=embedding_workers,
+    batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "16"))
+) if embedding_workers > 0 else None
+pipeline = IngestionPipeline(
+    loader, preprocess, embedder, storage, embedding_cache,
+    chunk_tokens=500, overlap_tokens=80, embedding_pool=embedding_pool
+)
+jobs = JobManager(pipeline, max_workers=int(os.getenv("INGEST_WORKERS", "2")))
+batcher = EmbeddingBatcher(
+    embedder,
+    max_batch_size=int(os.getenv("QUERY_BATCH_SIZE", "32")),
+    max_wait_ms=float(os.getenv("QUERY_BATCH_WAIT_MS", "2"))
+)
+packer = ContextPacker(
+    token_spans=embedder.token_spans,
+    default_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000")),
+    model_budgets=json.loads(os.getenv("CONTEXT_TOKEN_BUDGETS", "{}")),
+    context_length=model_catalog.context_length
+)
+query_cache = LRUCache(max_size=int(os.getenv("QUERY_CACHE_SIZE", "1024")), name="query_embeddings")
+results_cache = LRUCache(max_size=int(os.getenv("RESULTS_CACHE_SIZE", "1024")), name="search_results")
+answer_cache = AnswerCache(
+    os.getenv("ANSWER_CACHE_PATH", "./answer_cache/answers.sqlite3"),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "86400")),
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "10000"))
+)
 
 # Create data/pdf folder
-os.makedirs("./data/pdfs", exist_ok=True)
+pdf_dir = "./data/pdfs"
+os.makedirs(pdf_dir, exist_ok=True)
+max_upload_bytes = int(os.getenv("MAX_UPLOAD_MB", "200")) * 1024 * 1024
+max_upload_files = int(os.getenv("MAX_UPLOAD_FILES", "500"))
+# Chunk metadata set by ingestion itself
+RESERVED_METADATA = {"document_id", "filename", "page_start", "page_end"}
+
+# Admission control, each endpoint class has its own concurrency limit and
+# wait queue so slow LLM calls cannot hold up searches or uploads
+admission_timeout = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+ingest_slots = AdmissionController(
+    "ingest",
+    max_concurrent=int(os.getenv("INGEST_CONCURRENCY", "4")),
+    max_queue=int(os.getenv("INGEST_QUEUE", "16")),
+    queue_timeout=admission_timeout
+)
+search_slots = AdmissionController(
+    "search",
+    max_concurrent=int(os.getenv("SEARCH_CONCURRENCY", "32")),
+    max_queue=int(os.getenv("SEARCH_QUEUE", "256")),
+    queue_timeout=admission_timeout
+)
+llm_slots = AdmissionController(
+    "llm",
+    max_concurrent=int(os.getenv("LLM_CONCURRENCY", "16")),
+    max_queue=int(os.getenv("LLM_QUEUE", "64")),
+    max_queue_per_key=int(os.getenv("LLM_QUEUE_PER_KEY", "8")),
+    queue_timeout=admission_timeout
+)
+max_pending_jobs = int(os.getenv("INGEST_MAX_PENDING_JOBS", "100"))
+ingest_retry_after = int(os.getenv("INGEST_RETRY_AFTER", "30"))
+
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    # Stages run during the request add themselves to request_timings
+    timings = {}
+    token = request_timings.set(timings)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_timings.reset(token)
+    elapsed = time.perf_counter() - start
+
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        elapsed,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=response.status_code
+    )
+
+    # Streamed responses report what ran before the first byte
+    stages = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    stages.append(f"total;dur={elapsed * 1000:.1f}")
+    response.headers["Server-Timing"] = ", ".join(stages)
+    response.headers["X-Process-Time-Ms"] = f"{elapsed * 1000:.1f}"
+    return response
+
+# Flipped by warm_up, reported by /ready
+readiness = {"embedder": False, "storage": False, "error": None}
+warmup_task = None
+
+async def warm_up():
+    try:
+        # Open the index and load the model side by side, then run a first
+        # query so neither is cold when traffic arrives
+        _, vector = await asyncio.gather(
+            run_in_threadpool(storage.initialize_database, hnsw={
+                "M": int(os.environ["HNSW_M"]) if "HNSW_M" in os.environ else None,
+                "construction_ef": int(os.environ["HNSW_CONSTRUCTION_EF"]) if "HNSW_CONSTRUCTION_EF" in os.environ else None,
+                "search_ef": int(os.environ["HNSW_SEARCH_EF"]) if "HNSW_SEARCH_EF" in os.environ else None
+            }),
+            run_in_threadpool(embedder.warmup)
+        )
+        # Pool workers start once the model files are in the cache
+        if embedding_pool is not None:
+            await asyncio.gather(
+                run_in_threadpool(embedding_pool.warmup),
+                run_in_threadpool(storage.warmup, vector)
+            )
+        else:
+            await run_in_threadpool(storage.warmup, vector)
+        readiness["embedder"] = True
+        readiness["storage"] = True
+        print("✅ Services ready!")
+    except Exception as e:
+        readiness["error"] = str(e)
+        print(f"❌ Warm-up failed: {e}")
+
+async def wait_until_ready():
+    # Requests that arrive during warm-up wait for it instead of failing
+    await asyncio.shield(warmup_task)
+    if readiness["error"] is not None:
+        raise HTTPException(status_code=503, detail=f"Service failed to start: {readiness['error']}")
 
 @app.on_event("startup")
 async def startup_event():
+    global warmup_task
     print("🚀 Initializing services...")
-    storage.initialize_database()
-    embedder.load_model()
-    print("✅ Services ready!")
+    embedding_cache.initialize()
+    answer_cache.initialize()
+    batcher.start()
+    # Context windows size prompts in /ask, OpenRouter serves the list without a key
+    model_catalog.prefetch()
+    # The model and index load in the background so the server starts
+    # answering at once, /ready reports when they are warm
+    warmup_task = asyncio.create_task(warm_up())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if warmup_task is not None:
+        await asyncio.shield(warmup_task)
+    jobs.shutdown()
+    loader.shutdown()
+    if embedding_pool is not None:
+        embedding_pool.shutdown()
+    await batcher.stop()
+    embedding_cache.close()
+    answer_cache.close()
+    await llmservice.aclose()
+
+async def search_chunks(query: str, top_k: int, filters=None):
+    key = normalize_query(query)
+    where = storage.build_where(filters)
+
+    # Results are keyed on the storage version, so any insert or clear
+    # makes older entries unreachable
+    results_key = (key, top_k, json.dumps(where, sort_keys=True), storage.version)
+    results = results_cache.get(results_key)
+    if results is not None:
+        return results
+
+    # Cached results above skip admission, only real work takes a slot
+    async with search_slots.slot():
+        query_vector = query_cache.get(key)
+        if query_vector is None:
+            with query_stage("embed"):
+                query_vector = await batcher.embed(query)
+            query_cache.put(key, query_vector)
+
+        with query_stage("vector_query"):
+            results = await run_in_threadpool(storage.query, [query_vector], top_k, where)
+    results_cache.put(results_key, results)
+    return results
+
+def llm_key(api_key: str) -> str:
+    # LLM calls queue per API key, hashed so keys are never held in memory
+    return hash_text(api_key or "")[:16]
 
 @app.get("/")
 async def root():
@@ -55,71 +254,316 @@ async def root():
     }
 
 @app.post("/upload-pdf", response_model=PDFUploadResponse)
-async def upload_pdf(file: UploadFile = File(...)):
+async def upload_pdf(
+    file: UploadFile = File(...),
+    chunk_tokens: int = Form(None),
+    overlap_tokens: int = Form(None),
+    metadata: str = Form(None)
+):
 
     # Validate PDF format
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files allowed")
     
-    try:
-        # Save PDF
-        pdf_path = f"./data/pdfs/{file.filename}"
-        with open(pdf_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Process PDF
-        text = loader.load_pdf(pdf_path)
-        if not text:
-            raise HTTPException(status_code=400, detail="Can't extract text from PDF")
-        
-        # Clean and chunk
-        text = preprocess.clean_text(text)
-        chunks = preprocess.chunk_text(text, chunk_size=500, overlap=80)
-        
-        # Generate embeddings
-        embeddings = embedder.generate_embeddings(chunks)
+    validate_chunking(chunk_tokens, overlap_tokens)
+    metadata = parse_metadata(metadata)
+    
+    await wait_until_ready()
+    check_ingest_backlog()
+    async with ingest_slots.slot():
+        try:
+            # Save PDF off the event loop, hashing it as it is written
+            writer = await run_in_threadpool(write_stream, file.file, pdf_dir, file.filename, max_upload_bytes)
+            pdf_path = writer.keep()
         
-        # Save in database
-        storage.insert_chunks(chunks, embeddings)
+            # Parse, chunk, embed and store in the background
+            job = jobs.submit(file.filename, pdf_path, chunk_tokens, overlap_tokens, writer.document_id, metadata=metadata)
         
-        return PDFUploadResponse(
-            success=True,
-            message="PDF processed correctly",
-            chunks_count=len(chunks),
-            filename=file.filename
+            return PDFUploadResponse(
+                success=True,
+                message="PDF queued for processing",
+                chunks_count=0,
+                filename=file.filename,
+                job_id=job.id
+            )
+    
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+
+def check_ingest_backlog():
+    # Uploads are refused while the ingestion backlog is full rather than
+    # queueing work that would only finish long after clients gave up
+    if jobs.pending() >= max_pending_jobs:
+        ADMISSION_REJECTED.inc(endpoint_class="ingest", reason="backlog_full")
+        raise Overloaded(503, "Ingestion queue is full, try again later", ingest_retry_after)
+
+def validate_chunking(chunk_tokens: int, overlap_tokens: int):
+    # Chunks must fit in the model's window
+    if chunk_tokens is not None and not 0 < chunk_tokens <= embedder.max_tokens:
+        raise HTTPException(status_code=400, detail=f"chunk_tokens must be between 1 and {embedder.max_tokens}")
+    # Checked with the defaults filled in, a small chunk_tokens alone can
+    # fall below the default overlap
+    chunk_tokens = chunk_tokens if chunk_tokens is not None else pipeline.chunk_tokens
+    overlap_tokens = overlap_tokens if overlap_tokens is not None else pipeline.overlap_tokens
+    if not 0 <= overlap_tokens < chunk_tokens:
+        raise HTTPException(
+            status_code=400, detail=f"overlap_tokens ({overlap_tokens}) must be smaller than chunk_tokens ({chunk_tokens})"
+        )
+
+def parse_metadata(raw: str):
+    # Extra fields stored on every chunk of the upload, e.g. {"tenant": "acme"},
+    # used by search filters and, as VECTOR_SHARD_KEY, to pick the shard
+    if not raw:
+        return None
+    try:
+        metadata = json.loads(raw)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="metadata must be a JSON object")
+    if not isinstance(metadata, dict) or not all(isinstance(v, (str, int, float, bool)) for v in metadata.values()):
+        raise HTTPException(status_code=400, detail="metadata must be a JSON object of strings, numbers or booleans")
+    reserved = sorted(key for key in metadata if key in RESERVED_METADATA or key.startswith("$"))
+    if reserved:
+        raise HTTPException(status_code=400, detail=f"metadata cannot set {', '.join(reserved)}")
+    return metadata or None
+
+def admit_upload(filename: str, writer, chunk_tokens: int, overlap_tokens: int, metadata: dict = None) -> UploadedFile:
+    # Files already indexed or being ingested are dropped without a job
+    document_id = writer.document_id
+    active = jobs.find_active(document_id)
+    if active is not None:
+        writer.discard()
+        return UploadedFile(
+            filename=filename, status="skipped", document_id=document_id, job_id=active.id, detail="Already queued"
         )
+    # Only documents whose ingest finished count as indexed, one left
+    # part way by a failed job or a restart is ingested again and its
+    # missing chunks filled in
+    if storage.is_complete(document_id):
+        writer.discard()
+        return UploadedFile(filename=filename, status="skipped", document_id=document_id, detail="Already indexed")
+
+    job = jobs.submit(filename, writer.keep(), chunk_tokens, overlap_tokens, document_id, metadata=metadata)
+    return UploadedFile(filename=filename, status="queued", document_id=document_id, job_id=job.id)
+
+def process_upload(filename: str, writer, error: str, chunk_tokens: int, overlap_tokens: int, metadata: dict = None) -> list:
+    if error is not None:
+        return [UploadedFile(filename=filename, status="rejected", detail=error)]
+
+    if filename.lower().endswith(".pdf"):
+        return [admit_upload(filename, writer, chunk_tokens, overlap_tokens, metadata)]
+
+    if filename.lower().endswith(".zip"):
+        try:
+            return [
+                admit_upload(name, pdf, chunk_tokens, overlap_tokens, metadata) if pdf is not None
+                else UploadedFile(filename=name, status="rejected", detail=pdf_error)
+                for name, pdf, pdf_error in iter_zip_pdfs(writer.temp_path, pdf_dir, max_upload_bytes, max_upload_files)
+            ]
+        except Exception as e:
+            return [UploadedFile(filename=filename, status="rejected", detail=f"Invalid zip file: {str(e)}")]
+        finally:
+            writer.discard()
+
+    writer.discard()
+    return [UploadedFile(filename=filename, status="rejected", detail="Only PDF or zip files allowed")]
+
+@app.post("/upload-pdfs", response_model=BatchUploadResponse)
+async def upload_pdfs(request: Request, chunk_tokens: int = None, overlap_tokens: int = None, metadata: str = None):
+    # Many PDFs (or zip archives of PDFs) as multipart "files" parts. The body
+    # is parsed as it arrives and each file is queued as soon as it is complete
+    validate_chunking(chunk_tokens, overlap_tokens)
+    metadata = parse_metadata(metadata)
+    await wait_until_ready()
+    check_ingest_backlog()
+
+    try:
+        receiver = MultipartReceiver(request.headers.get("content-type", ""), pdf_dir, max_upload_bytes, max_upload_files)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    results = []
+    async with ingest_slots.slot():
+        try:
+            async for data in request.stream():
+                await run_in_threadpool(receiver.feed, data)
+                while receiver.files:
+                    results.extend(await run_in_threadpool(process_upload, *receiver.files.pop(0), chunk_tokens, overlap_tokens, metadata))
+            receiver.close()
+            while receiver.files:
+                results.extend(await run_in_threadpool(process_upload, *receiver.files.pop(0), chunk_tokens, overlap_tokens, metadata))
+        except Exception as e:
+            receiver.abort()
+            raise HTTPException(status_code=400, detail=f"Error reading upload: {str(e)}")
+
+    return BatchUploadResponse(files=results)
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+    return JobStatus(
+        job_id=job.id,
+        filename=job.filename,
+        document_id=job.document_id,
+        replaces=job.replaces,
+        stage=job.stage,
+        error=job.error,
+        pages_total=job.pages_total,
+        pages_done=job.pages_done,
+        chunks_done=job.chunks_done,
+        chunks_skipped=job.chunks_skipped,
+        chunks_cached=job.chunks_cached,
+        chars_removed=job.chars_removed,
+        chunks_saved=job.chunks_saved,
+        timings=dict(job.timings),
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
     
 @app.post("/search", response_model=SearchResult)
 async def search(request: SearchRequest):
-    if storage.collection.count() == 0:
+    await wait_until_ready()
+    if await run_in_threadpool(storage.count) == 0:
         raise HTTPException(status_code=400, detail="No indexed documents")
     
     try:
-        # Generate query embedding
-        query_emb = embedder.generate_embeddings([request.query])
-        
-        # Search in database
-        results = storage.query(query_emb, top_k=request.top_k)
+        # Embed the query and search, reusing cached vectors and results
+        results = await search_chunks(request.query, request.top_k, request.filters)
         
         return SearchResult(
             chunks=results["documents"][0],
-            distances=results["distances"][0]
+            distances=results["distances"][0],
+            metadatas=[m or {} for m in results["metadatas"][0]]
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in search: {str(e)}")
     
+@app.post("/search/batch", response_model=BatchSearchResult)
+async def search_batch(request: BatchSearchRequest):
+    await wait_until_ready()
+    if await run_in_threadpool(storage.count) == 0:
+        raise HTTPException(status_code=400, detail="No indexed documents")
+    
+    if not request.queries:
+        return BatchSearchResult(results=[])
+    
+    try:
+        # Embed every query not already cached in a single call
+        keys = [normalize_query(query) for query in request.queries]
+        vectors = [query_cache.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        
+        async with search_slots.slot():
+            if missing:
+                texts = [request.queries[i] for i in missing]
+                with query_stage("embed"):
+                    fresh = await run_in_threadpool(embedder.generate_embeddings, texts)
+                for i, vector in zip(missing, fresh):
+                    vectors[i] = vector
+                    query_cache.put(keys[i], vector.copy())
+            
+            # One multi-query search for the whole batch
+            where = storage.build_where(request.filters)
+            with query_stage("vector_query"):
+                results = await run_in_threadpool(storage.query, vectors, request.top_k, where)
+        
+        return BatchSearchResult(results=[
+            SearchResult(chunks=documents, distances=distances, metadatas=[m or {} for m in metadatas])
+            for documents, distances, metadatas in zip(results["documents"], results["distances"], results["metadatas"])
+        ])
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error in batch search: {str(e)}")
+    
+@app.get("/documents", response_model=DocumentsResponse)
+async def list_documents():
+    await wait_until_ready()
+    try:
+        documents = await run_in_threadpool(storage.list_documents)
+        return DocumentsResponse(documents=[DocumentInfo(**document) for document in documents])
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error listing documents: {str(e)}")
+
+@app.delete("/documents/{document_id}")
+async def delete_document(document_id: str):
+    await wait_until_ready()
+    try:
+        deleted = await run_in_threadpool(storage.delete_document, document_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting document: {str(e)}")
+    
+    if deleted == 0:
+        raise HTTPException(status_code=404, detail="Document not found")
+    remove_stored_files(pdf_dir, document_id)
+    return {"success": True, "document_id": document_id, "chunks_deleted": deleted}
+
+@app.put("/documents/{document_id}", response_model=PDFUploadResponse)
+async def replace_document(
+    document_id: str,
+    file: UploadFile = File(...),
+    chunk_tokens: int = Form(None),
+    overlap_tokens: int = Form(None),
+    metadata: str = Form(None)
+):
+    # The new version is ingested as its own document, the old chunks are
+    # deleted only once it is fully stored
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files allowed")
+    validate_chunking(chunk_tokens, overlap_tokens)
+    metadata = parse_metadata(metadata)
+    
+    await wait_until_ready()
+    if not await run_in_threadpool(storage.has_document, document_id):
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    check_ingest_backlog()
+    async with ingest_slots.slot():
+        try:
+            writer = await run_in_threadpool(write_stream, file.file, pdf_dir, file.filename, max_upload_bytes)
+            if writer.document_id == document_id:
+                writer.discard()
+                return PDFUploadResponse(
+                    success=True,
+                    message="Document unchanged",
+                    chunks_count=0,
+                    filename=file.filename
+                )
+        
+            job = jobs.submit(
+                file.filename, writer.keep(), chunk_tokens, overlap_tokens,
+                writer.document_id, replaces=document_id, metadata=metadata
+            )
+            return PDFUploadResponse(
+                success=True,
+                message="Replacement queued for processing",
+                chunks_count=0,
+                filename=file.filename,
+                job_id=job.id
+            )
+    
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+
 @app.delete("/clear")
 async def clear_database():
+    await wait_until_ready()
     try:
-        storage.client.delete_collection(name="documents")
-        storage.collection = storage.client.get_or_create_collection(
-            name="documents",
-            metadata={"hnsw:space": "cosine"}
-        )
+        await run_in_threadpool(storage.clear)
+        results_cache.clear()
+        await run_in_threadpool(answer_cache.clear)
         return {"success": True, "message": "Database clean"}
     
     except Exception as e:
@@ -127,39 +571,145 @@ async def clear_database():
     
 @app.get("/health")
 async def health_check():
+    # Liveness only, use /ready to know whether requests can be served
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    if readiness["error"] is not None:
+        raise HTTPException(status_code=503, detail=f"Service failed to start: {readiness['error']}")
+    if not (readiness["embedder"] and readiness["storage"]):
+        raise HTTPException(status_code=503, detail="Warming up")
+    return {"status": "ready", "documents": await run_in_threadpool(storage.count)}
+
+@app.get("/metrics")
+async def metrics():
+    QUEUE_DEPTH.set(jobs.pending(), queue="ingest_jobs")
+    QUEUE_DEPTH.set(batcher.pending, queue="query_embeddings")
+    for slots in (ingest_slots, search_slots, llm_slots):
+        QUEUE_DEPTH.set(slots.queued, queue=f"{slots.name}_admission")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "query_embeddings": query_cache.stats(),
+        "search_results": results_cache.stats(),
+        "answers": await run_in_threadpool(answer_cache.stats),
+        "models": model_catalog.stats()
+    }
+
 @app.post("/models", response_model=ModelsResponse)
 async def get_models(api_key: str):
-    models = llmservice.get_available_models(api_key)
+    models = await model_catalog.get(api_key)
     if not models:
         raise HTTPException(status_code=400, detail="Error obtaining models from OpenRouter")
-    return ModelsResponse(models=models)
+    return ModelsResponse(models=list(models), details=[ModelInfo(**model) for model in models.values()])
 
 @app.post("/ask", response_model=AskResponse)
 async def ask_question(request: AskRequest):
-    if storage.collection.count() == 0:
+    await wait_until_ready()
+    if await run_in_threadpool(storage.count) == 0:
         raise HTTPException(status_code=400, detail="No indexed documents")
     
+    # Keeps the context windows used to size the prompt current
+    model_catalog.prefetch(request.api_key)
+    
     try:
-        # Generate query embedding
-        query_emb = embedder.generate_embeddings([request.query])
-        
         # Search relevant chunks
-        results = storage.query(query_emb, top_k=request.top_k)
+        results = await search_chunks(request.query, request.top_k, request.filters)
         chunks = results["documents"][0]
         
-        # Generate LLM response
-        answer = llmservice.generate_answer(request.query, chunks, request.model, request.api_key)
+        # Same model, question and retrieved chunks give the same answer
+        cache_key = answer_cache.make_key(request.model, request.query, results["ids"][0])
+        answer = await run_in_threadpool(answer_cache.get, cache_key)
+        
+        if answer is None:
+            # Pack the chunks into a compact context and generate LLM response
+            with query_stage("pack"):
+                context = packer.pack(chunks, results["metadatas"][0], request.model)
+            async with llm_slots.slot(llm_key(request.api_key)):
+                with query_stage("llm"):
+                    answer = await llmservice.agenerate_answer(request.query, context, request.model, request.api_key)
+            if not answer.startswith("Error:"):
+                await run_in_threadpool(answer_cache.put, cache_key, answer)
         
         return AskResponse(
             answer=answer,
             chunks=chunks
         )
     
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/ask/stream")
+async def ask_question_stream(request: AskRequest):
+    await wait_until_ready()
+    if await run_in_threadpool(storage.count) == 0:
+        raise HTTPException(status_code=400, detail="No indexed documents")
+    
+    model_catalog.prefetch(request.api_key)
+    
+    try:
+        results = await search_chunks(request.query, request.top_k, request.filters)
+        chunks = results["documents"][0]
+        cache_key = answer_cache.make_key(request.model, request.query, results["ids"][0])
+        cached_answer = await run_in_threadpool(answer_cache.get, cache_key)
+        with query_stage("pack"):
+            context = packer.pack(chunks, results["metadatas"][0], request.model)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+    # Rejected before the stream starts, so clients still get a status code
+    # and Retry-After. The slot is released once, when the stream ends or
+    # when the response finishes without running it
+    released = cached_answer is not None
+    if not released:
+        await llm_slots.acquire(llm_key(request.api_key))
+
+    def release_slot():
+        nonlocal released
+        if not released:
+            released = True
+            llm_slots.release()
+
+    async def events():
+        try:
+            # Sources first, then tokens as the LLM produces them
+            yield sse_event("chunks", chunks)
+            if cached_answer is not None:
+                yield sse_event("token", cached_answer)
+                yield sse_event("done", {"cached": True})
+                return
+
+            tokens = []
+            with query_stage("llm"):
+                async for token in llmservice.stream_answer(request.query, context, request.model, request.api_key):
+                    tokens.append(token)
+                    yield sse_event("token", token)
+            # An empty stream is not an answer worth caching
+            if tokens:
+                await run_in_threadpool(answer_cache.put, cache_key, "".join(tokens))
+            yield sse_event("done", {"cached": False})
+        except Exception as e:
+            yield sse_event("error", f"Error: {str(e)}")
+        finally:
+            release_slot()
+
+    return SlotStreamingResponse(
+        events(),
+        release_slot,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,17 +1,36 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Dict, Optional, Any, Union
+
+class SearchFilters(BaseModel):
+    document_ids: Optional[List[str]] = None
+    filenames: Optional[List[str]] = None
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+    # Exact matches on metadata given at upload, e.g. {"tenant": "acme"}
+    metadata: Optional[Dict[str, Union[str, int, float, bool]]] = None
 
 class SearchRequest(BaseModel):
     query: str
     top_k: int = 3
+    filters: Optional[SearchFilters] = None
 
 class SearchResult(BaseModel):
     chunks: List[str]
     distances: List[float]
+    metadatas: List[Dict[str, Any]] = []
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    top_k: int = 3
+    filters: Optional[SearchFilters] = None
+
+class BatchSearchResult(BaseModel):
+    results: List[SearchResult]
 
 class AskRequest(BaseModel):
     query: str
     top_k: int = 3
+    filters: Optional[SearchFilters] = None
     model: str
     api_key: str
 
@@ -24,6 +43,55 @@ class PDFUploadResponse(BaseModel):
     message: str
     chunks_count: int
     filename: str
+    job_id: Optional[str] = None
+
+class UploadedFile(BaseModel):
+    filename: str
+    status: str  # queued, skipped or rejected
+    document_id: Optional[str] = None
+    job_id: Optional[str] = None
+    detail: Optional[str] = None
+
+class BatchUploadResponse(BaseModel):
+    files: List[UploadedFile]
+
+class DocumentInfo(BaseModel):
+    document_id: str
+    filename: Optional[str] = None
+    chunks: int
+    pages: int
+    # False while an ingest is storing it, or after one stopped part way
+    complete: bool = True
+
+class DocumentsResponse(BaseModel):
+    documents: List[DocumentInfo]
+
+class JobStatus(BaseModel):
+    job_id: str
+    filename: str
+    document_id: Optional[str] = None
+    replaces: Optional[str] = None
+    stage: str
+    error: Optional[str] = None
+    pages_total: int
+    pages_done: int
+    chunks_done: int
+    chunks_skipped: int
+    chunks_cached: int
+    chars_removed: int
+    chunks_saved: int
+    timings: Dict[str, float]
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+class ModelInfo(BaseModel):
+    id: str
+    name: Optional[str] = None
+    context_length: Optional[int] = None
+    max_completion_tokens: Optional[int] = None
+    pricing: Optional[Dict[str, Any]] = None
 
 class ModelsResponse(BaseModel):
-    models: List[str]
\ No newline at end of file
+    models: List[str]
+    details: List[ModelInfo] = []
\ No newline at end of file
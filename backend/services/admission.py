@@ -0,0 +1,129 @@
+import math
+import time
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from services.metrics import ADMISSION_REJECTED
+
+class Overloaded(HTTPException):
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(status_code=status_code, detail=detail, headers={"Retry-After": str(retry_after)})
+
+
+class AdmissionController:
+    # Caps how many requests of one class run at once. Requests over the cap
+    # wait in a bounded queue, served round-robin across keys (e.g. API keys)
+    # so one client cannot starve the others. A full queue or a wait longer
+    # than queue_timeout is rejected at once with a Retry-After estimate
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int,
+                 max_queue_per_key: int = None, queue_timeout: float = 10.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_per_key = max_queue_per_key
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self._waiting = OrderedDict()
+        # Moving average of how long a slot is held, for Retry-After
+        self._hold_seconds = 1.0
+
+    @asynccontextmanager
+    async def slot(self, key: str = ""):
+        await self.acquire(key)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start)
+
+    async def acquire(self, key: str = ""):
+        if self.active < self.max_concurrent and self.queued == 0:
+            self.active += 1
+            return
+
+        if self.queued >= self.max_queue:
+            self._reject("queue_full")
+            raise Overloaded(503, f"Too many {self.name} requests, try again later", self.retry_after())
+        if self.max_queue_per_key is not None and len(self._waiting.get(key, ())) >= self.max_queue_per_key:
+            self._reject("key_queue_full")
+            raise Overloaded(429, f"Too many queued {self.name} requests for this key", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(key, deque()).append(future)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                return
+            self._remove(key, future)
+            self._reject("timeout")
+            raise Overloaded(503, f"Timed out waiting for a {self.name} slot", self.retry_after())
+        except asyncio.CancelledError:
+            # The slot may have been handed over just as the client left
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                self._remove(key, future)
+            raise
+
+    def release(self, held_seconds: float = None):
+        if held_seconds is not None:
+            self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * held_seconds
+        self.active -= 1
+        self._dispatch()
+
+    def retry_after(self) -> int:
+        # Time for the queue ahead to drain at the current pace
+        return max(1, math.ceil(self._hold_seconds * (self.queued + 1) / self.max_concurrent))
+
+    def stats(self) -> dict:
+        return {"active": self.active, "queued": self.queued, "max_concurrent": self.max_concurrent, "max_queue": self.max_queue}
+
+    def _dispatch(self):
+        # Hands free slots to the next waiter of each key in turn
+        while self.active < self.max_concurrent and self._waiting:
+            key, waiters = next(iter(self._waiting.items()))
+            future = waiters.popleft()
+            self.queued -= 1
+            if waiters:
+                self._waiting.move_to_end(key)
+            else:
+                del self._waiting[key]
+            if future.done():
+                continue
+            self.active += 1
+            future.set_result(None)
+
+    def _remove(self, key: str, future):
+        waiters = self._waiting.get(key)
+        if waiters is not None and future in waiters:
+            waiters.remove(future)
+            self.queued -= 1
+            if not waiters:
+                del self._waiting[key]
+
+    def _reject(self, reason: str):
+        ADMISSION_REJECTED.inc(endpoint_class=self.name, reason=reason)
+
+
+class SlotStreamingResponse(StreamingResponse):
+    # Calls release when the response is done with, however it ends: a
+    # finished stream, a client gone before the first chunk, or a body that
+    # was never iterated. release must be safe to call more than once
+
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
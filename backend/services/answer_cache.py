@@ -0,0 +1,103 @@
+import os
+import time
+import sqlite3
+import threading
+
+from services.cache import normalize_query
+from services.hashing import hash_text
+from services.metrics import CACHE_REQUESTS
+
+class AnswerCache:
+
+    def __init__(self, path: str = "./answer_cache/answers.sqlite3", ttl_seconds: float = 86400, max_entries: int = 10000,
+                 touch_interval: float = 60):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # Hits refresh accessed_at at most this often, so most hits are reads only
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self.conn = None
+        self._lock = threading.Lock()
+
+    def initialize(self):
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, answer TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS answers_accessed ON answers (accessed_at)")
+            self.conn.commit()
+            print("[AnswerCache] Cache opened")
+
+    def make_key(self, model: str, query: str, chunk_ids: list[str]) -> str:
+        # Chunk ids are content hashes, so a different retrieval result
+        # (or a changed index) produces a different key
+        return hash_text("\0".join([model, normalize_query(query), ",".join(chunk_ids)]))
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT answer, created_at, accessed_at FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self.conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                    self.conn.commit()
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache="answers", result="miss")
+                return None
+
+            if now - row[2] > self.touch_interval:
+                self.conn.execute("UPDATE answers SET accessed_at = ? WHERE key = ?", (now, key))
+                self.conn.commit()
+            self.hits += 1
+            CACHE_REQUESTS.inc(cache="answers", result="hit")
+            return row[0]
+
+    def put(self, key: str, answer: str):
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, answer, now, now)
+            )
+            self._evict(now)
+            self.conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM answers")
+            self.conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "max_size": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def _evict(self, now: float):
+        self.conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,))
+        self.conn.execute(
+            "DELETE FROM answers WHERE key IN ("
+            "SELECT key FROM answers ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
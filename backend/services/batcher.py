@@ -0,0 +1,78 @@
+import asyncio
+from fastapi.concurrency import run_in_threadpool
+
+class EmbeddingBatcher:
+
+    def __init__(self, embedder, max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        self.embedder = embedder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._worker())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def pending(self) -> int:
+        # Queries waiting for the next batch
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def embed(self, text: str):
+        if self._task is None:
+            raise RuntimeError("Batcher is not started.")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Take whatever queued up while the previous batch was running,
+            # then wait out the remaining window for late arrivals
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _worker(self):
+        while True:
+            batch = await self._collect()
+            texts = [text for text, _ in batch]
+
+            try:
+                vectors = await run_in_threadpool(self.embedder.generate_embeddings, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            # Each caller gets its own row, a view would keep the whole
+            # batch matrix alive for as long as the vector is cached
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector.copy())
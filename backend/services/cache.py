@@ -0,0 +1,54 @@
+import threading
+from collections import OrderedDict
+
+from services.metrics import CACHE_REQUESTS
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.casefold().split())
+
+class LRUCache:
+
+    def __init__(self, max_size: int = 1024, name: str = "lru"):
+        self.max_size = max_size
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                CACHE_REQUESTS.inc(cache=self.name, result="hit")
+                return self._data[key]
+            self.misses += 1
+            CACHE_REQUESTS.inc(cache=self.name, result="miss")
+            return default
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
@@ -0,0 +1,140 @@
+import re
+
+from services.metrics import TOKENS
+
+WORD = re.compile(r'\S+')
+
+class ContextPacker:
+
+    def __init__(self, token_spans=None, default_budget: int = 3000, model_budgets: dict = None,
+                 min_overlap_chars: int = 20, duplicate_threshold: float = 0.9,
+                 context_length=None, context_share: float = 0.5):
+        self.token_spans = token_spans or (lambda text: [m.span() for m in WORD.finditer(text)])
+        self.default_budget = default_budget
+        self.model_budgets = model_budgets or {}
+        self.min_overlap_chars = min_overlap_chars
+        self.duplicate_threshold = duplicate_threshold
+        # Looks up a model's context window, e.g. from the model catalog
+        self.context_length = context_length or (lambda model: None)
+        self.context_share = context_share
+
+    def budget_for(self, model: str = None) -> int:
+        if model in self.model_budgets:
+            return self.model_budgets[model]
+        # Leave the rest of a small window for the prompt and the answer
+        window = self.context_length(model)
+        if window:
+            return min(self.default_budget, int(window * self.context_share))
+        return self.default_budget
+
+    def pack(self, chunks: list[str], metadatas: list[dict] = None, model: str = None) -> list[str]:
+        # Merges overlapping chunks of the same document, drops near
+        # duplicates, keeps the best ranked passages that fit in the model's
+        # token budget and returns them grouped by document in page order
+        metadatas = metadatas or [{}] * len(chunks)
+        passages = [
+            {
+                "text": chunk,
+                "rank": rank,
+                "document": (metadata or {}).get("document_id"),
+                "page": (metadata or {}).get("page_start", 0)
+            }
+            for rank, (chunk, metadata) in enumerate(zip(chunks, metadatas))
+        ]
+
+        passages = self._merge(passages)
+        passages = self._dedupe(passages)
+        passages = self._trim(passages, self.budget_for(model))
+
+        document_rank = {}
+        for passage in passages:
+            document_rank.setdefault(passage["document"], passage["rank"])
+        passages.sort(key=lambda p: (document_rank[p["document"]], p["page"], p["rank"]))
+
+        return [passage["text"] for passage in passages]
+
+    def _merge(self, passages):
+        groups = {}
+        for passage in passages:
+            # Chunks without a document id cannot be known to be adjacent
+            key = passage["document"] if passage["document"] is not None else ("rank", passage["rank"])
+            groups.setdefault(key, []).append(passage)
+
+        merged = []
+        for group in groups.values():
+            # Keep merging pairs until no two passages overlap, top_k is small
+            changed = True
+            while changed:
+                changed = False
+                for i in range(len(group)):
+                    for j in range(i + 1, len(group)):
+                        a, b = group[i], group[j]
+                        text = self._join(a["text"], b["text"]) or self._join(b["text"], a["text"])
+                        if text is None:
+                            continue
+                        group[i] = {
+                            "text": text,
+                            "rank": min(a["rank"], b["rank"]),
+                            "document": a["document"],
+                            "page": min(a["page"], b["page"])
+                        }
+                        del group[j]
+                        changed = True
+                        break
+                    if changed:
+                        break
+            merged.extend(group)
+
+        return sorted(merged, key=lambda p: p["rank"])
+
+    def _join(self, first: str, second: str):
+        if second in first:
+            return first
+
+        # Find the longest suffix of first that is a prefix of second
+        probe = second[:self.min_overlap_chars]
+        if len(probe) < self.min_overlap_chars:
+            return None
+
+        pos = first.find(probe)
+        while pos != -1:
+            if second.startswith(first[pos:]):
+                return first + second[len(first) - pos:]
+            pos = first.find(probe, pos + 1)
+        return None
+
+    def _dedupe(self, passages):
+        kept = []
+        shingles = []
+        for passage in passages:
+            words = passage["text"].lower().split()
+            current = {tuple(words[i:i + 3]) for i in range(max(len(words) - 2, 1))}
+            if any(self._similarity(current, other) >= self.duplicate_threshold for other in shingles):
+                continue
+            kept.append(passage)
+            shingles.append(current)
+        return kept
+
+    def _similarity(self, a: set, b: set) -> float:
+        if not a or not b:
+            return 0.0
+        return len(a & b) / len(a | b)
+
+    def _trim(self, passages, budget: int):
+        kept = []
+        remaining = budget
+        for passage in passages:
+            spans = self.token_spans(passage["text"])
+            if len(spans) <= remaining:
+                kept.append(passage)
+                remaining -= len(spans)
+                continue
+
+            # Cut the first passage that does not fit and stop there
+            if remaining > 0:
+                kept.append(dict(passage, text=passage["text"][:spans[remaining - 1][1]]))
+                remaining = 0
+            break
+
+        TOKENS.inc(budget - remaining, kind="context")
+        return kept
@@ -0,0 +1,50 @@
+import os
+import sqlite3
+import threading
+import numpy as np
+
+class EmbeddingCache:
+
+    def __init__(self, path: str = "./embedding_cache/embeddings.sqlite3"):
+        self.path = path
+        self.conn = None
+        self._lock = threading.Lock()
+
+    def initialize(self):
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, text_hash))"
+            )
+            self.conn.commit()
+            print("[EmbeddingCache] Cache opened")
+
+    def get_many(self, model: str, text_hashes: list[str]) -> dict:
+        if not text_hashes:
+            return {}
+
+        placeholders = ",".join("?" * len(text_hashes))
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model, *text_hashes]
+            ).fetchall()
+
+        return {text_hash: np.frombuffer(blob, dtype=np.float32) for text_hash, blob in rows}
+
+    def put_many(self, model: str, vectors: dict):
+        rows = [(model, text_hash, np.asarray(vector, dtype=np.float32).tobytes()) for text_hash, vector in vectors.items()]
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                rows
+            )
+            self.conn.commit()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,70 @@
+import os
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# Model held by each worker process, loaded once by _init_worker
+_worker_model = None
+
+
+def _init_worker(model_name: str, cache_dir: str, threads: int):
+    global _worker_model
+    from fastembed.embedding import TextEmbedding
+    _worker_model = TextEmbedding(model_name=model_name, cache_dir=cache_dir, threads=threads)
+
+
+def _embed_batch(texts: list[str]) -> np.ndarray:
+    vectors = _worker_model.embed(texts, batch_size=len(texts))
+    return np.stack(list(vectors)).astype(np.float32, copy=False)
+
+
+class EmbeddingPool:
+    # Spreads embedding batches over worker processes that each load the
+    # model once. Matches EmbeddingService.generate_embeddings
+
+    def __init__(self, model_name: str, cache_dir: str = None, workers: int = None, batch_size: int = 16):
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        # Split the cores between workers so their ONNX thread pools do not
+        # oversubscribe the machine
+        self.threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._pool is None:
+                # Spawned rather than forked, forking a process that already
+                # runs ONNX Runtime threads can deadlock the child
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_name, self.cache_dir, self.threads)
+                )
+                print(f"[EmbeddingPool] Started {self.workers} workers")
+
+    def warmup(self):
+        # One batch per worker so every process has loaded its model
+        self.start()
+        list(self._pool.map(_embed_batch, [["warm up"]] * self.workers))
+
+    def generate_embeddings(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        self.start()
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        # map returns results in submission order
+        matrices = list(self._pool.map(_embed_batch, batches))
+        if len(matrices) == 1:
+            return matrices[0]
+        return np.concatenate(matrices)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
@@ -1,19 +1,74 @@
-from fastembed.embedding import TextEmbedding
+import re
+import threading
+import numpy as np
 
 class EmbeddingService:
 
-    def __init__(self):
+    def __init__(self, model_name: str = "BAAI/bge-small-en-v1.5", batch_size: int = 256, cache_dir: str = None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        # Keeping the model files in a persistent directory means a restart
+        # never downloads them again
+        self.cache_dir = cache_dir
         self.embedder = None
+        self.tokenizer = None
+        # bge-small reads 512 tokens including [CLS] and [SEP]
+        self.max_tokens = 510
+        self._lock = threading.Lock()
 
     def load_model(self):
-        if self.embedder is None:
-            print("Loading model..")
-            self.embedder = TextEmbedding(model_name="BAAI/bge-small-en-v1.5")
-            print("Model loaded")
+        with self._lock:
+            if self.embedder is None:
+                # fastembed pulls in onnxruntime, so it is only imported when needed
+                from fastembed.embedding import TextEmbedding
+                print("Loading model..")
+                self.embedder = TextEmbedding(model_name=self.model_name, cache_dir=self.cache_dir)
+                print("Model loaded")
+
+    def warmup(self) -> np.ndarray:
+        # One inference and one tokenization so the first request does not
+        # pay for session and tokenizer initialization
+        self.load_model()
+        vector = self.generate_embeddings(["warm up"])[0]
+        self.token_spans("warm up")
+        return vector
+
+    def generate_embeddings(self, texts: list[str]) -> np.ndarray:
+        # Returns a contiguous (len(texts), dim) float32 matrix
+        matrices = list(self.iter_embeddings(texts))
+        if len(matrices) == 1:
+            return matrices[0]
+        if not matrices:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.concatenate(matrices)
 
-    def generate_embeddings(self, texts: list[str]):
+    def iter_embeddings(self, texts: list[str], batch_size: int = None):
+        # Yields one float32 matrix per fixed-size batch of texts
         if self.embedder is None:
             raise RuntimeError("Model is not loaded.")
-        
-        vectors = list(self.embedder.embed(texts))
-        return [v.tolist() for v in vectors]
\ No newline at end of file
+
+        batch_size = batch_size or self.batch_size
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            vectors = self.embedder.embed(batch, batch_size=len(batch))
+            yield np.stack(list(vectors)).astype(np.float32, copy=False)
+
+    def token_spans(self, text: str):
+        # Character spans of the model's tokens, used to size chunks
+        tokenizer = self._load_tokenizer()
+        if tokenizer is None:
+            return [m.span() for m in re.finditer(r"\S+", text)]
+        return tokenizer.encode(text, add_special_tokens=False).offsets
+
+    def _load_tokenizer(self):
+        if self.tokenizer is None and self.embedder is not None:
+            base = getattr(getattr(self.embedder, "model", None), "tokenizer", None)
+            if base is not None:
+                # Copy so counting is never truncated or padded, without
+                # touching the tokenizer the model uses for inference
+                from tokenizers import Tokenizer
+                tokenizer = Tokenizer.from_str(base.to_str())
+                tokenizer.no_truncation()
+                tokenizer.no_padding()
+                self.tokenizer = tokenizer
+        return self.tokenizer
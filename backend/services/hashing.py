@@ -0,0 +1,14 @@
+import hashlib
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def hash_file(path: str, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id(document_id: str, chunk_hash: str) -> str:
+    return f"{document_id[:16]}_{chunk_hash[:16]}"
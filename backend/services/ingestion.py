@@ -0,0 +1,207 @@
+import os
+import time
+import numpy as np
+from itertools import islice
+
+from services.hashing import hash_file, hash_text, chunk_id
+from services.uploads import remove_stored_files
+from services.metrics import PAGES, CHUNKS, BOILERPLATE_CHARS
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+class IngestionPipeline:
+
+    def __init__(self, loader, preprocess, embedder, storage, embedding_cache=None,
+                 chunk_tokens=500, overlap_tokens=80, batch_size=64, embedding_pool=None):
+        self.loader = loader
+        self.preprocess = preprocess
+        self.embedder = embedder
+        # Vectors come from the worker pool when there is one, the
+        # in-process embedder still sizes chunks with its tokenizer
+        self.encoder = embedding_pool or embedder
+        self.storage = storage
+        self.embedding_cache = embedding_cache
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.batch_size = batch_size
+
+    def run(self, job) -> int:
+        job.set_stage("extracting")
+        if job.document_id is None:
+            job.document_id = hash_file(job.pdf_path)
+        job.pages_total = self.loader.count_pages(job.pdf_path)
+
+        # Batches are stored as they are embedded, so a run that fails
+        # part way removes what it stored unless the document was already
+        # fully indexed before, a replaced document is only dropped after
+        # success. Only a finished run marks the document complete, one
+        # stopped by a crash leaves it incomplete and it is ingested again
+        existed = self.storage.is_complete(job.document_id)
+        try:
+            self._ingest(job)
+        except Exception:
+            if not existed:
+                self._discard(job)
+            raise
+        with job.timed("store"):
+            self.storage.mark_complete(job.document_id)
+
+        # The old version stays searchable until the new one is stored, so
+        # a replace never leaves the document missing
+        if job.replaces and job.replaces != job.document_id:
+            job.set_stage("storing")
+            with job.timed("store"):
+                self.storage.delete_document(job.replaces)
+            remove_stored_files(os.path.dirname(job.pdf_path), job.replaces)
+
+        return job.chunks_done
+
+    def _ingest(self, job):
+        # Pages are cleaned and chunked as they are extracted, and each
+        # batch of chunks is embedded and stored while later pages are parsed
+        chunk_stream = self.preprocess.chunk_pages(
+            self._pages(job),
+            max_tokens=job.chunk_tokens or self.chunk_tokens,
+            overlap_tokens=job.overlap_tokens if job.overlap_tokens is not None else self.overlap_tokens,
+            token_spans=self.embedder.token_spans
+        )
+
+        seen = set()
+        for batch in self._timed_batches(chunk_stream, job):
+            pages = [(start, end) for _, start, end in batch]
+            batch = [text for text, _, _ in batch]
+            hashes = [hash_text(text) for text in batch]
+            ids = [chunk_id(job.document_id, h) for h in hashes]
+            job.chunks_done += len(batch)
+
+            # Repeated passages within a document map to the same id
+            new = []
+            for i, id_ in enumerate(ids):
+                if id_ not in seen:
+                    seen.add(id_)
+                    new.append(i)
+
+            with job.timed("store"):
+                existing = self.storage.existing_ids([ids[i] for i in new])
+            new = [i for i in new if ids[i] not in existing]
+            job.chunks_skipped += len(batch) - len(new)
+            CHUNKS.inc(len(batch) - len(new), status="skipped")
+            if not new:
+                continue
+
+            texts = [batch[i] for i in new]
+            job.set_stage("embedding")
+            with job.timed("embed"):
+                embeddings = self._embed(texts, [hashes[i] for i in new], job)
+
+            job.set_stage("storing")
+            with job.timed("store"):
+                self.storage.insert_chunks(
+                    texts, embeddings,
+                    ids=[ids[i] for i in new],
+                    metadatas=[self._metadata(job, *pages[i]) for i in new]
+                )
+            job.set_stage("extracting")
+
+        if job.chunks_done == 0:
+            raise ValueError("Can't extract text from PDF")
+        # Chunks advance by about chars_kept / chunks_done characters each
+        job.chunks_saved = round(job.chars_removed * job.chunks_done / max(job.chars_kept, 1))
+
+    def _discard(self, job):
+        try:
+            with job.timed("store"):
+                deleted = self.storage.delete_document(job.document_id)
+            if deleted:
+                print(f"[Ingestion] Removed {deleted} chunks of failed {job.filename}")
+        except Exception as e:
+            print(f"[Ingestion] Error removing chunks of failed {job.filename}: {e}")
+
+    def _metadata(self, job, page_start, page_end):
+        return {
+            **(job.metadata or {}),
+            "document_id": job.document_id,
+            "filename": job.filename,
+            "page_start": page_start,
+            "page_end": page_end
+        }
+
+    def _embed(self, texts, hashes, job):
+        if self.embedding_cache is None:
+            CHUNKS.inc(len(texts), status="embedded")
+            return self.encoder.generate_embeddings(texts)
+
+        model = self.embedder.model_name
+        cached = self.embedding_cache.get_many(model, hashes)
+        missing = [i for i, h in enumerate(hashes) if h not in cached]
+        job.chunks_cached += len(hashes) - len(missing)
+        CHUNKS.inc(len(hashes) - len(missing), status="cached")
+        CHUNKS.inc(len(missing), status="embedded")
+
+        if not missing:
+            return np.stack([cached[h] for h in hashes])
+
+        vectors = self.encoder.generate_embeddings([texts[i] for i in missing])
+        self.embedding_cache.put_many(model, {hashes[i]: vector for i, vector in zip(missing, vectors)})
+        if len(missing) == len(hashes):
+            return vectors
+
+        # Fill one matrix from the fresh and cached rows
+        embeddings = np.empty((len(hashes), vectors.shape[1]), dtype=np.float32)
+        embeddings[missing] = vectors
+        for i, h in enumerate(hashes):
+            if h in cached:
+                embeddings[i] = cached[h]
+        return embeddings
+
+    def _timed_batches(self, chunk_stream, job):
+        # Chunking runs lazily while batches are pulled, so its time is the
+        # wait for a batch minus the extraction and cleaning done meanwhile
+        batches = batched(chunk_stream, self.batch_size)
+        while True:
+            before = job.timings.get("extract", 0.0) + job.timings.get("clean", 0.0)
+            start = time.perf_counter()
+            batch = next(batches, None)
+            elapsed = time.perf_counter() - start
+            upstream = job.timings.get("extract", 0.0) + job.timings.get("clean", 0.0) - before
+            job.add_timing("chunk", max(elapsed - upstream, 0.0))
+            if batch is None:
+                return
+            yield batch
+
+    def _pages(self, job):
+        # Boilerplate stripping reads a few pages ahead, so its time is the
+        # wait for a page minus the extraction done meanwhile
+        pages = self.preprocess.strip_boilerplate(self._extracted_pages(job))
+        while True:
+            before = job.timings.get("extract", 0.0)
+            start = time.perf_counter()
+            page = next(pages, None)
+            if page is not None:
+                page_number, text, removed = page
+                text = self.preprocess.clean_text(text)
+            elapsed = time.perf_counter() - start
+            job.add_timing("clean", max(elapsed - (job.timings.get("extract", 0.0) - before), 0.0))
+            if page is None:
+                return
+
+            for kind, chars in removed.items():
+                if chars:
+                    BOILERPLATE_CHARS.inc(chars, kind=kind)
+                    job.chars_removed += chars
+            job.chars_kept += len(text)
+            yield page_number, text
+
+    def _extracted_pages(self, job):
+        pages = self.loader.iter_pages(job.pdf_path)
+        while True:
+            with job.timed("extract"):
+                page = next(pages, None)
+            if page is None:
+                return
+            job.pages_done += 1
+            PAGES.inc()
+            yield page
@@ -0,0 +1,116 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from services.metrics import INGEST_STAGE_SECONDS
+
+class Job:
+
+    def __init__(self, filename: str, pdf_path: str, chunk_tokens: int = None, overlap_tokens: int = None,
+                 document_id: str = None, replaces: str = None, metadata: dict = None):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.pdf_path = pdf_path
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        # Known up front when the file was hashed while it was uploaded
+        self.document_id = document_id
+        # Document removed once this one is stored
+        self.replaces = replaces
+        # Extra fields stored on every chunk, e.g. a tenant
+        self.metadata = metadata
+        self.stage = "queued"
+        self.error = None
+        self.pages_total = 0
+        self.pages_done = 0
+        self.chunks_done = 0
+        self.chunks_skipped = 0
+        self.chunks_cached = 0
+        # Boilerplate stripped before chunking, and an estimate of the
+        # chunks it would have filled
+        self.chars_kept = 0
+        self.chars_removed = 0
+        self.chunks_saved = 0
+        self.timings = {}
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def set_stage(self, stage: str):
+        self.stage = stage
+
+    def add_timing(self, name: str, seconds: float):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+        INGEST_STAGE_SECONDS.observe(seconds, stage=name)
+
+    @contextmanager
+    def timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_timing(name, time.perf_counter() - start)
+
+    @property
+    def done(self) -> bool:
+        return self.stage in ("done", "failed")
+
+
+class JobManager:
+
+    def __init__(self, pipeline, max_workers: int = 2, history_size: int = 1000):
+        self.pipeline = pipeline
+        self.history_size = history_size
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+
+    def submit(self, filename: str, pdf_path: str, chunk_tokens: int = None, overlap_tokens: int = None,
+               document_id: str = None, replaces: str = None, metadata: dict = None) -> Job:
+        job = Job(filename, pdf_path, chunk_tokens, overlap_tokens, document_id, replaces, metadata)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def pending(self) -> int:
+        return sum(1 for job in list(self.jobs.values()) if not job.done)
+
+    def find_active(self, document_id: str):
+        # A queued or running job for the same file content
+        for job in list(self.jobs.values()):
+            if not job.done and job.document_id == document_id:
+                return job
+        return None
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: Job):
+        job.started_at = time.time()
+        job.add_timing("queued", job.started_at - job.created_at)
+        try:
+            with job.timed("total"):
+                self.pipeline.run(job)
+            job.set_stage("done")
+        except Exception as e:
+            print(f"[Jobs] Job {job.id} failed: {e}")
+            job.error = str(e)
+            job.set_stage("failed")
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self):
+        # Drop the oldest finished jobs once the history is full
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= self.history_size:
+                break
+            if self.jobs[job_id].done:
+                del self.jobs[job_id]
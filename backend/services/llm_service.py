@@ -1,64 +1,123 @@
-import requests
+import json
+import httpx
+
+from services.metrics import TOKENS
+
+SYSTEM_PROMPT = """You are a helpful assistant that answers questions based on the provided context.
+        Only use information from the context to answer. If the answer is not in the context, say you don't know."""
 
 class LLMService:
 
-    def __init__(self):
-        pass
+    def __init__(self, base_url: str = "https://openrouter.ai/api/v1", max_connections: int = 100):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self._client = None
 
-    def get_available_models(self, api_key: str):
-        try:
-            response = requests.get(
-                "https://openrouter.ai/api/v1/models",
-                headers={"Authorization": f"Bearer {api_key}"},
-                timeout=10
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # One pooled client for the whole process keeps connections to
+        # OpenRouter alive between requests
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(60, connect=10),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
             )
-            
-            if response.status_code == 200:
-                models_data = response.json()
-                return [model["id"] for model in models_data["data"]]
-            else:
-                return []
-        
-        except Exception as e:
-            print(f"Error fetching models: {e}")
-            return []
-    
-    def generate_answer(self, query, context_chunks, model, api_key):
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch_models(self, api_key: str = None) -> list[dict]:
+        # Full catalog entries, raises when OpenRouter cannot be reached
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        response = await self.client.get("/models", headers=headers, timeout=10)
+        response.raise_for_status()
+        return response.json()["data"]
+
+    def build_messages(self, query, context_chunks):
         context = "\n\n".join(context_chunks)
         
-        system_prompt = """You are a helpful assistant that answers questions based on the provided context.
-        Only use information from the context to answer. If the answer is not in the context, say you don't know."""
-        
         user_prompt = f"""Context: {context}
 
         Question: {query}
 
         Answer:"""
-        
+
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _record_usage(self, data: dict):
+        usage = data.get("usage") or {}
+        if usage.get("prompt_tokens"):
+            TOKENS.inc(usage["prompt_tokens"], kind="prompt")
+        if usage.get("completion_tokens"):
+            TOKENS.inc(usage["completion_tokens"], kind="completion")
+
+    def _headers(self, api_key):
+        return {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    async def agenerate_answer(self, query, context_chunks, model, api_key):
         try:
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json"
-                },
+            response = await self.client.post(
+                "/chat/completions",
+                headers=self._headers(api_key),
                 json={
                     "model": model,
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ]
-                },
-                timeout=60
+                    "messages": self.build_messages(query, context_chunks)
+                }
             )
-            
+
             if response.status_code == 200:
                 data = response.json()
+                self._record_usage(data)
                 return data["choices"][0]["message"]["content"]
             else:
                 return f"Error: {response.status_code} - {response.text}"
-        
-        except requests.exceptions.Timeout:
+
+        except httpx.TimeoutException:
             return "Error: Request timed out"
         except Exception as e:
             return f"Error: {str(e)}"
+
+    async def stream_answer(self, query, context_chunks, model, api_key):
+        # Yields content deltas from an OpenAI-compatible SSE stream
+        async with self.client.stream(
+            "POST",
+            "/chat/completions",
+            headers=self._headers(api_key),
+            json={
+                "model": model,
+                "messages": self.build_messages(query, context_chunks),
+                "stream": True
+            }
+        ) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                raise RuntimeError(f"{response.status_code} - {body.decode(errors='replace')}")
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+
+                event = json.loads(data)
+                self._record_usage(event)
+                choices = event.get("choices") or []
+                if not choices:
+                    continue
+                token = (choices[0].get("delta") or {}).get("content")
+                if token:
+                    yield token
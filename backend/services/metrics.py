@@ -0,0 +1,156 @@
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Stage timings of the current HTTP request, reported in Server-Timing
+request_timings = ContextVar("request_timings", default=None)
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = [(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Metric:
+    type = None
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"]
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_sample(self, key, state) -> list[str]:
+        lines = []
+        for bound, count in zip(self.buckets, state["counts"]):
+            labels = _format_labels(self.labels, key, [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {count}")
+        labels = _format_labels(self.labels, key, [("le", "+Inf")])
+        lines.append(f"{self.name}_bucket{labels} {state['count']}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(state['sum'])}")
+        lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {state['count']}")
+        return lines
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "rag_http_request_seconds", "HTTP request latency", ["method", "route", "status"]
+))
+INGEST_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "rag_ingest_stage_seconds", "Latency of ingestion stages (extract, clean, chunk, embed, store)", ["stage"]
+))
+QUERY_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "rag_query_stage_seconds", "Latency of query stages (embed, vector_query, pack, llm)", ["stage"]
+))
+PAGES = REGISTRY.register(Counter("rag_pages_total", "PDF pages extracted"))
+CHUNKS = REGISTRY.register(Counter(
+    "rag_chunks_total", "Chunks produced by ingestion, by outcome (embedded, cached, skipped)", ["status"]
+))
+BOILERPLATE_CHARS = REGISTRY.register(Counter(
+    "rag_boilerplate_chars_total", "Characters stripped from extracted pages, by kind (page_number, repeated, toc, hyphenation)", ["kind"]
+))
+TOKENS = REGISTRY.register(Counter(
+    "rag_tokens_total", "Tokens sent as prompt context or reported by the LLM", ["kind"]
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "rag_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"]
+))
+ADMISSION_REJECTED = REGISTRY.register(Counter(
+    "rag_admission_rejected_total", "Requests shed by admission control", ["endpoint_class", "reason"]
+))
+QUEUE_DEPTH = REGISTRY.register(Gauge("rag_queue_depth", "Items waiting in internal queues", ["queue"]))
+
+@contextmanager
+def query_stage(stage: str):
+    # Records a query stage in the histogram and in the request's Server-Timing
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        QUERY_STAGE_SECONDS.observe(elapsed, stage=stage)
+        timings = request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
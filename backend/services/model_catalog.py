@@ -0,0 +1,85 @@
+import time
+import asyncio
+
+from services.metrics import CACHE_REQUESTS
+
+class ModelCatalog:
+    # OpenRouter's model list kept in process for ttl_seconds. Concurrent
+    # refreshes share one upstream call, and once the catalog has been
+    # loaded an expired copy is served while it is refreshed in the background.
+    # After a failed fetch no new one starts for retry_seconds
+
+    def __init__(self, llm_service, ttl_seconds: float = 3600, retry_seconds: float = 30):
+        self.llm_service = llm_service
+        self.ttl_seconds = ttl_seconds
+        self.retry_seconds = retry_seconds
+        self.models = {}
+        self.fetched_at = 0.0
+        self.failed_at = None
+        self._refresh = None
+
+    @property
+    def is_fresh(self) -> bool:
+        return bool(self.models) and time.time() - self.fetched_at < self.ttl_seconds
+
+    async def get(self, api_key: str = None) -> dict:
+        if self.is_fresh:
+            CACHE_REQUESTS.inc(cache="models", result="hit")
+            return self.models
+
+        CACHE_REQUESTS.inc(cache="models", result="miss")
+        refresh = self._start_refresh(api_key)
+        if self.models or refresh is None:
+            return self.models
+        # Nothing to serve yet, wait for the shared refresh. Shielded so a
+        # client that disconnects does not cancel it for the others
+        await asyncio.shield(refresh)
+        return self.models
+
+    def prefetch(self, api_key: str = None):
+        # Starts a refresh when the catalog is missing or expired, without waiting
+        if not self.is_fresh:
+            self._start_refresh(api_key)
+
+    def context_length(self, model: str):
+        return (self.models.get(model) or {}).get("context_length")
+
+    def stats(self) -> dict:
+        return {
+            "models": len(self.models),
+            "age_seconds": round(time.time() - self.fetched_at, 1) if self.fetched_at else None,
+            "ttl_seconds": self.ttl_seconds,
+            "refreshing": self._refresh is not None,
+            "failed_at": self.failed_at
+        }
+
+    def _start_refresh(self, api_key: str = None):
+        # None while backing off after a failure
+        if self._refresh is None:
+            if self.failed_at is not None and time.time() - self.failed_at < self.retry_seconds:
+                return None
+            self._refresh = asyncio.get_running_loop().create_task(self._load(api_key))
+        return self._refresh
+
+    async def _load(self, api_key: str = None):
+        try:
+            entries = await self.llm_service.fetch_models(api_key)
+            self.models = {
+                entry["id"]: {
+                    "id": entry["id"],
+                    "name": entry.get("name"),
+                    "context_length": entry.get("context_length"),
+                    "max_completion_tokens": (entry.get("top_provider") or {}).get("max_completion_tokens"),
+                    "pricing": entry.get("pricing")
+                }
+                for entry in entries
+            }
+            self.fetched_at = time.time()
+            self.failed_at = None
+            print(f"[ModelCatalog] {len(self.models)} models loaded")
+        except Exception as e:
+            # Keep serving the previous catalog, if there is one
+            self.failed_at = time.time()
+            print(f"[ModelCatalog] Error fetching models: {e}")
+        finally:
+            self._refresh = None
@@ -0,0 +1,338 @@
+import os
+import glob
+import json
+import sqlite3
+import operator
+import threading
+import numpy as np
+
+from services.hashing import hash_text
+from services.storage_base import BaseStorage, DocumentTable, lock_directory
+
+COMPARISONS = {
+    "$eq": operator.eq,
+    "$ne": operator.ne,
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le
+}
+
+class NumpyStorage(BaseStorage):
+    # Exact cosine search over a memory-mapped float32 matrix. Rows are
+    # stored normalized in vectors.f32, ids, texts, metadata and the
+    # per-document counts in SQLite
+
+    def __init__(self, path: str = "./numpy_db"):
+        super().__init__()
+        self.path = path
+        self.conn = None
+        self.documents = None
+        self.dim = None
+        self.generation = 0
+        self.vectors = None
+        self.ids = []
+        self.metadatas = []
+        self._rows = {}
+        self._columns = {}
+        self._lock = threading.Lock()
+
+    @property
+    def vectors_path(self) -> str:
+        return self._vectors_file(self.generation)
+
+    def _vectors_file(self, generation: int) -> str:
+        # Deletes write a new generation of the matrix, switched to in the
+        # same transaction that renumbers the rows
+        if generation == 0:
+            return os.path.join(self.path, "vectors.f32")
+        return os.path.join(self.path, f"vectors.{generation}.f32")
+
+    def initialize_database(self, **options):
+        if self.conn is None:
+            lock_directory(self.path)
+            self.conn = sqlite3.connect(os.path.join(self.path, "chunks.sqlite3"), check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, document TEXT NOT NULL, metadata TEXT)"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self.documents = DocumentTable(self.conn)
+            self.conn.commit()
+            self._load()
+            if self.documents.created and self.ids:
+                self.documents.rebuild(self.metadatas)
+                self.conn.commit()
+            print(f"[NumpyStorage] Loaded {len(self.ids)} chunks")
+
+    def _load(self):
+        rows = self.conn.execute("SELECT id, metadata FROM chunks ORDER BY row").fetchall()
+        self.ids = [id_ for id_, _ in rows]
+        self.metadatas = [json.loads(metadata) if metadata else None for _, metadata in rows]
+        self._rows = {id_: i for i, id_ in enumerate(self.ids)}
+        self._columns = {}
+
+        dim = self.conn.execute("SELECT value FROM info WHERE key = 'dim'").fetchone()
+        self.dim = int(dim[0]) if dim else None
+        generation = self.conn.execute("SELECT value FROM info WHERE key = 'generation'").fetchone()
+        self.generation = int(generation[0]) if generation else 0
+
+        # Matrices left behind by a delete that did not finish
+        for path in glob.glob(os.path.join(self.path, "vectors*.f32")):
+            if path != self.vectors_path:
+                os.remove(path)
+
+        # Vectors are appended before rows are committed, so drop any
+        # rows written by an insert that did not finish
+        if self.dim is not None and os.path.exists(self.vectors_path):
+            expected = len(self.ids) * self.dim * 4
+            if os.path.getsize(self.vectors_path) < expected:
+                raise RuntimeError("[NumpyStorage] vectors.f32 is shorter than the chunk table")
+            if os.path.getsize(self.vectors_path) > expected:
+                os.truncate(self.vectors_path, expected)
+        self._remap()
+
+    def _remap(self):
+        if not self.ids:
+            self.vectors = None
+            return
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.ids), self.dim))
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def insert_chunks(self, texts: list[str], embeddings: np.ndarray, ids: list[str] = None, metadatas: list[dict] = None):
+        if ids is None:
+            ids = [hash_text(text)[:32] for text in texts]
+        metadatas = metadatas or [None] * len(texts)
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        matrix = matrix / norms
+
+        with self._lock:
+            # Like Chroma's add, ids that already exist are ignored
+            keep = []
+            seen = set()
+            for i, id_ in enumerate(ids):
+                if id_ not in self._rows and id_ not in seen:
+                    seen.add(id_)
+                    keep.append(i)
+            if not keep:
+                return
+
+            if self.dim is None:
+                self.dim = matrix.shape[1]
+                self.conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('dim', ?)", (str(self.dim),))
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match index dimension {self.dim}")
+
+            start = len(self.ids)
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.ascontiguousarray(matrix[keep]).tobytes())
+
+            self.conn.executemany(
+                "INSERT INTO chunks (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (start + n, ids[i], texts[i], json.dumps(metadatas[i]) if metadatas[i] else None)
+                    for n, i in enumerate(keep)
+                ]
+            )
+            self.documents.add([metadatas[i] for i in keep])
+            self.conn.commit()
+
+            for n, i in enumerate(keep):
+                self._rows[ids[i]] = start + n
+            self.ids.extend(ids[i] for i in keep)
+            self.metadatas.extend(metadatas[i] for i in keep)
+            self._columns = {}
+            self._remap()
+            self.version += 1
+
+        print(f"[NumpyStorage] Inserted {len(keep)} chunks")
+
+    def existing_ids(self, ids: list[str]) -> set:
+        return {id_ for id_ in ids if id_ in self._rows}
+
+    def has_document(self, document_id: str) -> bool:
+        with self._lock:
+            return self.documents.get(document_id) is not None
+
+    def is_complete(self, document_id: str) -> bool:
+        with self._lock:
+            document = self.documents.get(document_id)
+        return document is not None and document["complete"]
+
+    def mark_complete(self, document_id: str):
+        with self._lock:
+            self.documents.mark_complete(document_id)
+            self.conn.commit()
+
+    def list_documents(self) -> list[dict]:
+        with self._lock:
+            return self.documents.list()
+
+    def delete_document(self, document_id: str) -> int:
+        with self._lock:
+            n = len(self.ids)
+            if n == 0:
+                return 0
+            mask = self._match({"document_id": document_id}, n)
+            deleted = int(mask.sum())
+            if deleted:
+                self._compact(~mask, document_id)
+                self.version += 1
+        if deleted:
+            print(f"[NumpyStorage] Deleted {deleted} chunks of {document_id[:16]}")
+        return deleted
+
+    def _compact(self, keep: np.ndarray, document_id: str):
+        # Copies the kept rows to a new matrix file, then renumbers the
+        # chunk table and points it at the new file in one transaction
+        kept = np.flatnonzero(keep)
+        dropped = np.flatnonzero(~keep)
+        generation = self.generation + 1
+        path = self._vectors_file(generation)
+
+        with open(path, "wb") as f:
+            for start in range(0, len(kept), 65536):
+                f.write(np.ascontiguousarray(self.vectors[kept[start:start + 65536]]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        with self.conn:
+            self.conn.executemany("DELETE FROM chunks WHERE row = ?", [(int(r),) for r in dropped])
+            self.documents.remove(document_id)
+            # Through negative numbers so no two rows ever share a key
+            self.conn.executemany(
+                "UPDATE chunks SET row = ? WHERE row = ?",
+                [(-1 - new, int(old)) for new, old in enumerate(kept) if new != old]
+            )
+            self.conn.execute("UPDATE chunks SET row = -1 - row WHERE row < 0")
+            self.conn.execute(
+                "INSERT OR REPLACE INTO info (key, value) VALUES ('generation', ?)", (str(generation),)
+            )
+
+        old_path = self.vectors_path
+        self.generation = generation
+        self.ids = [self.ids[i] for i in kept]
+        self.metadatas = [self.metadatas[i] for i in kept]
+        self._rows = {id_: i for i, id_ in enumerate(self.ids)}
+        self._columns = {}
+        self._remap()
+        os.remove(old_path)
+
+    def clear(self):
+        with self._lock:
+            self.vectors = None
+            if os.path.exists(self.vectors_path):
+                os.remove(self.vectors_path)
+            self.conn.execute("DELETE FROM chunks")
+            self.conn.execute("DELETE FROM info")
+            self.documents.clear()
+            self.conn.commit()
+            self.dim = None
+            self.generation = 0
+            self.ids = []
+            self.metadatas = []
+            self._rows = {}
+            self._columns = {}
+            self.version += 1
+        print("[NumpyStorage] Index cleared")
+
+    def query(self, query_embedding, top_k=3, where: dict = None):
+        queries = np.asarray(query_embedding, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[np.newaxis]
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+
+        # A consistent snapshot, deletes replace these lists and the matrix
+        with self._lock:
+            vectors = self.vectors
+            ids = self.ids
+            metadatas = self.metadatas
+            n = len(ids)
+            mask = self._match(where, n) if where and vectors is not None else None
+        if vectors is None:
+            for key in results:
+                results[key] = [[] for _ in range(len(queries))]
+            return results
+
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        scores = (queries / norms) @ vectors[:n].T
+
+        candidates = n
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+            candidates = int(mask.sum())
+        k = min(top_k, candidates)
+
+        for row_scores in scores:
+            if k == 0:
+                top = np.empty(0, dtype=np.int64)
+            else:
+                top = np.argpartition(-row_scores, k - 1)[:k]
+                top = top[np.argsort(-row_scores[top])]
+
+            rows = top.tolist()
+            results["ids"].append([ids[r] for r in rows])
+            results["documents"].append(self._documents([ids[r] for r in rows]))
+            results["metadatas"].append([metadatas[r] for r in rows])
+            results["distances"].append((1.0 - row_scores[top]).tolist())
+
+        return results
+
+    def _documents(self, ids: list[str]) -> list[str]:
+        # Looked up by id, row numbers change when a document is deleted
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            found = dict(self.conn.execute(
+                f"SELECT id, document FROM chunks WHERE id IN ({placeholders})", ids
+            ).fetchall())
+        return [found.get(id_, "") for id_ in ids]
+
+    def _column(self, key: str, n: int) -> np.ndarray:
+        column = self._columns.get(key)
+        if column is None or len(column) < n:
+            values = [(metadata or {}).get(key) for metadata in self.metadatas[:n]]
+            present = [v for v in values if v is not None]
+            if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+                column = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            else:
+                column = np.empty(len(values), dtype=object)
+                column[:] = values
+            self._columns[key] = column
+        return column[:n]
+
+    def _match(self, where: dict, n: int) -> np.ndarray:
+        # Evaluates the subset of Chroma's where syntax that build_where emits
+        if "$and" in where:
+            return np.logical_and.reduce([self._match(c, n) for c in where["$and"]])
+        if "$or" in where:
+            return np.logical_or.reduce([self._match(c, n) for c in where["$or"]])
+
+        (key, condition), = where.items()
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        (op, value), = condition.items()
+        column = self._column(key, n)
+
+        if op in ("$in", "$nin"):
+            values = set(value)
+            if column.dtype == object:
+                mask = np.fromiter((v in values for v in column), dtype=bool, count=len(column))
+            else:
+                mask = np.isin(column, list(values))
+            return ~mask if op == "$nin" else mask
+
+        compare = COMPARISONS[op]
+        if column.dtype == object:
+            return np.fromiter(
+                (v is not None and compare(v, value) for v in column), dtype=bool, count=len(column)
+            )
+        return compare(column, value)
@@ -1,20 +1,73 @@
+import os
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pypdf import PdfReader
 
+
+def _extract_page_range(pdf_path: str, start: int, end: int):
+    # Runs inside a worker process, each worker opens its own reader
+    reader = PdfReader(pdf_path)
+    return [(i + 1, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
 class PDFLoader:
-    
-    def __init__(self):
-        pass
 
-    def load_pdf(self, pdf_path: str) -> str:
-        try:
-            reader = PdfReader(pdf_path)
-            pages_text = []
+    def __init__(self, workers: int = None, pages_per_task: int = 8):
+        self.workers = workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._pool is None:
+                # One pool shared by every job, spawned rather than forked
+                # like the embedding pool, since the server process already
+                # runs ONNX Runtime threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                print(f"[PDFLoader] Started {self.workers} extraction workers")
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
 
-            for page in reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    pages_text.append(page_text)
+    def count_pages(self, pdf_path: str) -> int:
+        return len(PdfReader(pdf_path).pages)
 
+    def iter_pages(self, pdf_path: str):
+        # Yields (page_number, text) in page order, page numbers start at 1
+        reader = PdfReader(pdf_path)
+        total = len(reader.pages)
+
+        if self.workers <= 1 or total <= self.pages_per_task:
+            for i, page in enumerate(reader.pages):
+                yield i + 1, page.extract_text() or ""
+            return
+
+        # Only `workers` ranges are in flight per file, so jobs running at
+        # the same time take turns in the shared pool
+        ranges = deque((s, min(s + self.pages_per_task, total)) for s in range(0, total, self.pages_per_task))
+        self.start()
+        futures = deque()
+        try:
+            while ranges or futures:
+                while ranges and len(futures) < self.workers:
+                    futures.append(self._pool.submit(_extract_page_range, pdf_path, *ranges.popleft()))
+                yield from futures.popleft().result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def load_pdf(self, pdf_path: str) -> str:
+        try:
+            pages_text = [text for _, text in self.iter_pages(pdf_path) if text]
             return "\n".join(pages_text)
 
         except Exception as e:
@@ -23,4 +76,4 @@ class PDFLoader:
 
 def test_pdf_text_extract(pdf_path: str) -> str:
     loader = PDFLoader()
-    return loader.load_pdf(pdf_path)
\ No newline at end of file
+    return loader.load_pdf(pdf_path)
@@ -1,4 +1,14 @@
 import re
+from bisect import bisect_left
+from collections import Counter, deque
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+WORD = re.compile(r'\S+')
+DIGITS = re.compile(r'\d+')
+PAGE_NUMBER = re.compile(r'^(?:page\s*)?(?:\d+|(?=[ivx])x{0,3}(?:ix|iv|v?i{0,3}))(?:\s*(?:of|/)\s*\d+)?$', re.IGNORECASE)
+# Table of contents entries end in dot leaders and a page number
+TOC_ENTRY = re.compile(r'(?:\.\s*){4,}\d+$')
+HYPHEN_BREAK = re.compile(r'(?<=[a-z])-\n\s*(?=[a-z])')
 
 class Preprocess:
 
@@ -9,16 +19,116 @@ class Preprocess:
         text = re.sub(r'\s+', ' ', text)
         text = text.replace("\u00A0", " ")
         return text.strip()
-    
-    def chunk_text(self, text: str, chunk_size=500, overlap=80):
-        words = text.split()
-        chunks = []
+
+    def strip_boilerplate(self, pages, lookahead: int = 8, min_repeats: int = 3, edge_lines: int = 3):
+        # Takes (page_number, text) pairs as extracted, before clean_text, and
+        # yields (page_number, text, removed) with removed counting the dropped
+        # characters by kind. Lines near the top or bottom of a page that recur
+        # on min_repeats pages are headers or footers; digits are ignored when
+        # comparing so "Page 3 of 9" matches "Page 4 of 9". Pages are held back
+        # `lookahead` pages so the first ones are judged with what follows
+        counts = Counter()
+        buffer = deque()
+
+        for page_number, text in pages:
+            lines = text.splitlines()
+            keys = {i: DIGITS.sub("#", lines[i].strip().lower()) for i in self._edge_lines(lines, edge_lines)}
+            counts.update(set(keys.values()))
+            buffer.append((page_number, lines, keys))
+            if len(buffer) > lookahead:
+                yield self._strip_page(*buffer.popleft(), counts, min_repeats)
+
+        while buffer:
+            yield self._strip_page(*buffer.popleft(), counts, min_repeats)
+
+    def _edge_lines(self, lines, edge_lines):
+        filled = [i for i, line in enumerate(lines) if line.strip()]
+        return set(filled[:edge_lines] + filled[-edge_lines:])
+
+    def _strip_page(self, page_number, lines, keys, counts, min_repeats):
+        removed = {"page_number": 0, "repeated": 0, "toc": 0, "hyphenation": 0}
+        kept = []
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if i in keys and PAGE_NUMBER.match(stripped):
+                removed["page_number"] += len(line)
+            elif i in keys and counts[keys[i]] >= min_repeats:
+                removed["repeated"] += len(line)
+            elif TOC_ENTRY.search(stripped):
+                removed["toc"] += len(line)
+            else:
+                kept.append(line)
+
+        text = "\n".join(kept)
+        joined = HYPHEN_BREAK.sub("", text)
+        removed["hyphenation"] = len(text) - len(joined)
+        return page_number, joined, removed
+
+    def word_spans(self, text: str):
+        return [m.span() for m in WORD.finditer(text)]
+
+    def chunk_text(self, text: str, chunk_size=500, overlap=80, token_spans=None):
+        chunks = self.chunk_pages([(1, text)], max_tokens=chunk_size, overlap_tokens=overlap, token_spans=token_spans)
+        return [chunk for chunk, _, _ in chunks]
+
+    def chunk_pages(self, pages, max_tokens=500, overlap_tokens=80, token_spans=None):
+        # Takes (page_number, text) pairs and yields (chunk, page_start, page_end).
+        # Chunks are packed from whole sentences up to max_tokens, measured
+        # with token_spans (word spans by default, or the embedding model's
+        # tokenizer). The window only holds character offsets into the page
+        # texts; a chunk string is built once, when it is yielded
+        token_spans = token_spans or self.word_spans
+        window = []
+        size = 0
+        fresh = False
+
+        for page_number, text in pages:
+            spans = token_spans(text)
+            starts = [start for start, _ in spans]
+
+            for sentence_start, sentence_end in self._sentences(text):
+                first = bisect_left(starts, sentence_start)
+                last = bisect_left(starts, sentence_end)
+
+                # Sentences longer than the budget are split at token boundaries
+                for i in range(first, last, max_tokens):
+                    j = min(i + max_tokens, last)
+                    unit = (page_number, text, spans[i][0], spans[j - 1][1], j - i)
+
+                    if size + unit[4] > max_tokens and fresh:
+                        yield self._join(window)
+                        window = self._overlap(window, overlap_tokens)
+                        size = sum(u[4] for u in window)
+                        fresh = False
+
+                    while window and size + unit[4] > max_tokens:
+                        size -= window.pop(0)[4]
+
+                    window.append(unit)
+                    size += unit[4]
+                    fresh = True
+
+        if fresh:
+            yield self._join(window)
+
+    def _sentences(self, text: str):
         start = 0
+        for m in SENTENCE_END.finditer(text):
+            yield start, m.start()
+            start = m.end()
+        if start < len(text):
+            yield start, len(text)
 
-        while start < len(words):
-            end = start + chunk_size
-            chunk = words[start:end]
-            chunks.append(" ".join(chunk))
-            start += chunk_size - overlap
+    def _overlap(self, window, overlap_tokens):
+        kept = []
+        size = 0
+        for unit in reversed(window):
+            if size + unit[4] > overlap_tokens:
+                break
+            kept.append(unit)
+            size += unit[4]
+        return kept[::-1]
 
-        return chunks
\ No newline at end of file
+    def _join(self, window):
+        chunk = " ".join(text[start:end] for _, text, start, end, _ in window)
+        return chunk, window[0][0], window[-1][0]
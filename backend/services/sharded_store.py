@@ -0,0 +1,143 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from services.hashing import hash_text
+from services.storage_base import BaseStorage
+
+class ShardedStorage(BaseStorage):
+    # Spreads chunks over several storages by hashing one metadata field
+    # (document_id by default, or e.g. a tenant or group field), queries the
+    # shards concurrently and merges their top-k by distance
+
+    def __init__(self, shards: list, shard_key: str = "document_id"):
+        super().__init__()
+        self.shards = shards
+        self.shard_key = shard_key
+        self._pool = ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="shard")
+
+    def shard_for(self, value) -> int:
+        return int(hash_text(str(value))[:8], 16) % len(self.shards)
+
+    def initialize_database(self, **options):
+        for shard in self.shards:
+            shard.initialize_database(**options)
+
+    def count(self) -> int:
+        return sum(self._map(lambda shard: shard.count(), self.shards))
+
+    def insert_chunks(self, texts, embeddings, ids=None, metadatas=None):
+        if ids is None:
+            ids = [hash_text(text)[:32] for text in texts]
+        metadatas = metadatas or [None] * len(texts)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+
+        groups = {}
+        for i, metadata in enumerate(metadatas):
+            value = (metadata or {}).get(self.shard_key, ids[i])
+            groups.setdefault(self.shard_for(value), []).append(i)
+
+        def insert(item):
+            shard, rows = item
+            self.shards[shard].insert_chunks(
+                [texts[i] for i in rows],
+                embeddings[rows],
+                ids=[ids[i] for i in rows],
+                metadatas=[metadatas[i] for i in rows]
+            )
+
+        self._map(insert, groups.items())
+        self.version += 1
+
+    def existing_ids(self, ids: list[str]) -> set:
+        if not ids:
+            return set()
+        return set().union(*self._map(lambda shard: shard.existing_ids(ids), self.shards))
+
+    def has_document(self, document_id: str) -> bool:
+        shards = [self.shards[i] for i in self._route({"document_id": document_id})]
+        return any(self._map(lambda shard: shard.has_document(document_id), shards))
+
+    def is_complete(self, document_id: str) -> bool:
+        shards = [self.shards[i] for i in self._route({"document_id": document_id})]
+        return any(self._map(lambda shard: shard.is_complete(document_id), shards))
+
+    def mark_complete(self, document_id: str):
+        shards = [self.shards[i] for i in self._route({"document_id": document_id})]
+        self._map(lambda shard: shard.mark_complete(document_id), shards)
+
+    def list_documents(self) -> list[dict]:
+        # A document spans shards when the shard key is not document_id
+        documents = {}
+        for shard_documents in self._map(lambda shard: shard.list_documents(), self.shards):
+            for document in shard_documents:
+                merged = documents.setdefault(document["document_id"], dict(document, chunks=0, pages=0))
+                merged["chunks"] += document["chunks"]
+                merged["pages"] = max(merged["pages"], document["pages"])
+                merged["complete"] = merged["complete"] or document["complete"]
+        return sorted(documents.values(), key=lambda d: (d["filename"] or "", d["document_id"]))
+
+    def delete_document(self, document_id: str) -> int:
+        shards = [self.shards[i] for i in self._route({"document_id": document_id})]
+        deleted = sum(self._map(lambda shard: shard.delete_document(document_id), shards))
+        if deleted:
+            self.version += 1
+        return deleted
+
+    def clear(self):
+        self._map(lambda shard: shard.clear(), self.shards)
+        self.version += 1
+
+    def query(self, query_embedding, top_k=3, where: dict = None):
+        queries = np.asarray(query_embedding, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[np.newaxis]
+
+        shards = [self.shards[i] for i in self._route(where)]
+        partials = self._map(lambda shard: shard.query(queries, top_k=top_k, where=where), shards)
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for q in range(len(queries)):
+            candidates = []
+            for partial in partials:
+                candidates.extend(zip(
+                    partial["distances"][q], partial["ids"][q],
+                    partial["documents"][q], partial["metadatas"][q]
+                ))
+            candidates.sort(key=lambda c: c[0])
+            candidates = candidates[:top_k]
+
+            results["distances"].append([c[0] for c in candidates])
+            results["ids"].append([c[1] for c in candidates])
+            results["documents"].append([c[2] for c in candidates])
+            results["metadatas"].append([c[3] for c in candidates])
+
+        return results
+
+    def _route(self, where: dict) -> list[int]:
+        # Only the shards owning the filtered shard key values can match
+        values = self._shard_key_values(where)
+        if values is None:
+            return list(range(len(self.shards)))
+        return sorted({self.shard_for(value) for value in values})
+
+    def _shard_key_values(self, where: dict):
+        if not where:
+            return None
+        conditions = where["$and"] if "$and" in where else [where]
+        for condition in conditions:
+            if self.shard_key not in condition:
+                continue
+            value = condition[self.shard_key]
+            if not isinstance(value, dict):
+                return [value]
+            if "$eq" in value:
+                return [value["$eq"]]
+            if "$in" in value:
+                return value["$in"]
+        return None
+
+    def _map(self, fn, items):
+        items = list(items)
+        if len(items) == 1:
+            return [fn(items[0])]
+        return list(self._pool.map(fn, items))
@@ -0,0 +1,211 @@
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Lock files held by this process, by store directory
+_directory_locks = {}
+
+class BaseStorage:
+    # Interface main.py talks to. Results from query() use Chroma's shape:
+    # {"ids", "documents", "metadatas", "distances"}, one list per query,
+    # with cosine distances
+
+    def __init__(self):
+        # Bumped on every change so cached search results can be invalidated
+        self.version = 0
+
+    def initialize_database(self, **options):
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def insert_chunks(self, texts, embeddings, ids=None, metadatas=None):
+        raise NotImplementedError
+
+    def existing_ids(self, ids: list[str]) -> set:
+        raise NotImplementedError
+
+    def has_document(self, document_id: str) -> bool:
+        # True once any chunk is stored, see is_complete
+        raise NotImplementedError
+
+    def is_complete(self, document_id: str) -> bool:
+        # True once an ingest stored all of the document's chunks
+        raise NotImplementedError
+
+    def mark_complete(self, document_id: str):
+        raise NotImplementedError
+
+    def list_documents(self) -> list[dict]:
+        raise NotImplementedError
+
+    def delete_document(self, document_id: str) -> int:
+        # Returns the number of chunks removed
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def query(self, query_embedding, top_k=3, where: dict = None):
+        raise NotImplementedError
+
+    def warmup(self, query_embedding):
+        # A first query loads the index (or pages in the vectors) before
+        # any user request needs it
+        if self.count() > 0:
+            self.query([query_embedding], top_k=1)
+
+    def build_where(self, filters) -> dict:
+        if filters is None:
+            return None
+
+        conditions = []
+        if filters.document_ids:
+            conditions.append({"document_id": {"$in": filters.document_ids}})
+        if filters.filenames:
+            conditions.append({"filename": {"$in": filters.filenames}})
+        # A chunk matches when its page span overlaps the requested range
+        if filters.page_start is not None:
+            conditions.append({"page_end": {"$gte": filters.page_start}})
+        if filters.page_end is not None:
+            conditions.append({"page_start": {"$lte": filters.page_end}})
+        for key, value in (filters.metadata or {}).items():
+            conditions.append({key: value})
+
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$and": conditions}
+
+
+def summarize_documents(metadatas) -> list[dict]:
+    # One entry per document_id found in the chunk metadata
+    documents = {}
+    for metadata in metadatas:
+        if not metadata or "document_id" not in metadata:
+            continue
+        document = documents.setdefault(metadata["document_id"], {
+            "document_id": metadata["document_id"],
+            "filename": metadata.get("filename"),
+            "chunks": 0,
+            "pages": 0
+        })
+        document["chunks"] += 1
+        document["pages"] = max(document["pages"], metadata.get("page_end") or 0)
+    return sorted(documents.values(), key=lambda d: (d["filename"] or "", d["document_id"]))
+
+
+class DocumentTable:
+    # One row per document with its chunk count, last page and whether an
+    # ingest finished storing it, kept in SQLite next to the chunks and
+    # updated by every insert and delete, so listing or looking up
+    # documents does not read the chunks. Callers hold their storage's
+    # lock and commit
+
+    def __init__(self, conn):
+        self.conn = conn
+        # True for a store opened before the table existed, whose documents
+        # are then counted once from the chunks with rebuild()
+        self.created = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'documents'"
+        ).fetchone() is None
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "document_id TEXT PRIMARY KEY, filename TEXT, chunks INTEGER NOT NULL, pages INTEGER NOT NULL, "
+            "complete INTEGER NOT NULL DEFAULT 0)"
+        )
+
+    def add(self, metadatas):
+        # metadatas of newly stored chunks only
+        self.conn.executemany(
+            "INSERT INTO documents (document_id, filename, chunks, pages) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (document_id) DO UPDATE SET "
+            "chunks = chunks + excluded.chunks, pages = MAX(pages, excluded.pages)",
+            [
+                (document["document_id"], document["filename"], document["chunks"], document["pages"])
+                for document in summarize_documents(metadatas)
+            ]
+        )
+
+    def mark_complete(self, document_id: str):
+        self.conn.execute("UPDATE documents SET complete = 1 WHERE document_id = ?", (document_id,))
+
+    def remove(self, document_id: str):
+        self.conn.execute("DELETE FROM documents WHERE document_id = ?", (document_id,))
+
+    def clear(self):
+        self.conn.execute("DELETE FROM documents")
+
+    def rebuild(self, metadatas):
+        # Nothing tells whether the ingests of an older store finished, its
+        # documents are taken as complete
+        self.clear()
+        self.add(metadatas)
+        self.conn.execute("UPDATE documents SET complete = 1")
+
+    def get(self, document_id: str):
+        row = self.conn.execute(
+            "SELECT document_id, filename, chunks, pages, complete FROM documents WHERE document_id = ?", (document_id,)
+        ).fetchone()
+        return self._document(row) if row else None
+
+    def list(self) -> list[dict]:
+        rows = self.conn.execute(
+            "SELECT document_id, filename, chunks, pages, complete FROM documents "
+            "ORDER BY COALESCE(filename, ''), document_id"
+        ).fetchall()
+        return [self._document(row) for row in rows]
+
+    def _document(self, row) -> dict:
+        document_id, filename, chunks, pages, complete = row
+        return {"document_id": document_id, "filename": filename, "chunks": chunks, "pages": pages, "complete": bool(complete)}
+
+
+def create_storage(backend: str = "chroma", shards: int = 1, shard_key: str = "document_id", **kwargs) -> BaseStorage:
+    # Backends are imported on demand so each deployment only loads its own
+    if shards > 1:
+        from services.sharded_store import ShardedStorage
+        return ShardedStorage(
+            [_create_shard(backend, i, **kwargs) for i in range(shards)],
+            shard_key=shard_key
+        )
+    return _create_shard(backend, None, **kwargs)
+
+def _create_shard(backend: str, index: int = None, **kwargs) -> BaseStorage:
+    if backend == "chroma":
+        from services.vector_store import Storage
+        if index is not None:
+            kwargs["collection_name"] = f"{kwargs.get('collection_name', 'documents')}_{index}"
+        return Storage(**kwargs)
+    if backend == "numpy":
+        from services.numpy_store import NumpyStorage
+        if index is not None:
+            kwargs["path"] = f"{kwargs.get('path', './numpy_db')}/shard_{index}"
+        return NumpyStorage(**kwargs)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def lock_directory(path: str):
+    # Only one process may open a store: the NumPy backend's lock and
+    # memory maps and Chroma's caches do not coordinate across processes.
+    # Held until the process exits, storages sharing a directory share it
+    path = os.path.realpath(path)
+    if path in _directory_locks:
+        return
+    os.makedirs(path, exist_ok=True)
+    lock_file = open(os.path.join(path, ".lock"), "a+")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock_file.close()
+        raise RuntimeError(f"{path} is in use by another process (the API server or a bulk ingest), stop it first")
+    _directory_locks[path] = lock_file
@@ -0,0 +1,205 @@
+import os
+import re
+import glob
+import uuid
+import hashlib
+import zipfile
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+BLOCK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def safe_filename(filename: str) -> str:
+    name = os.path.basename((filename or "").replace("\\", "/"))
+    return re.sub(r"[^\w.\- ]", "_", name) or "upload"
+
+
+class UploadWriter:
+    # Writes one upload to a temporary file piece by piece, hashing it on the
+    # way and enforcing the size cap. Once finished it is either kept under a
+    # name derived from its hash, so same-named files never collide, or discarded
+
+    def __init__(self, directory: str, filename: str, max_bytes: int):
+        self.directory = directory
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.document_id = None
+        self._digest = hashlib.sha256()
+        self._temp_path = os.path.join(directory, f".upload_{uuid.uuid4().hex}")
+        self._file = open(self._temp_path, "wb")
+
+    def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"{self.filename} is larger than {self.max_bytes // (1024 * 1024)} MB")
+        self._digest.update(data)
+        self._file.write(data)
+
+    def finish(self) -> str:
+        self._file.close()
+        self.document_id = self._digest.hexdigest()
+        return self.document_id
+
+    def keep(self) -> str:
+        path = os.path.join(self.directory, f"{self.document_id[:16]}_{safe_filename(self.filename)}")
+        os.replace(self._temp_path, path)
+        return path
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+    @property
+    def temp_path(self) -> str:
+        return self._temp_path
+
+
+def remove_stored_files(directory: str, document_id: str) -> int:
+    # Stored uploads are named after their hash prefix, see UploadWriter.keep
+    paths = glob.glob(os.path.join(glob.escape(directory), f"{document_id[:16]}_*"))
+    for path in paths:
+        os.remove(path)
+    return len(paths)
+
+
+def write_stream(stream, directory: str, filename: str, max_bytes: int) -> UploadWriter:
+    # Copies a file object through an UploadWriter, returns it finished
+    writer = UploadWriter(directory, filename, max_bytes)
+    try:
+        while block := stream.read(BLOCK_SIZE):
+            writer.write(block)
+        writer.finish()
+    except Exception:
+        writer.discard()
+        raise
+    return writer
+
+
+def iter_zip_pdfs(zip_path: str, directory: str, max_bytes: int, max_files: int):
+    # Yields (filename, writer or None, error) for each PDF in the archive.
+    # Members are streamed out with the same size cap as direct uploads
+    with zipfile.ZipFile(zip_path) as archive:
+        members = [
+            m for m in archive.infolist()
+            if not m.is_dir() and m.filename.lower().endswith(".pdf") and not m.filename.startswith("__MACOSX/")
+        ]
+        for n, member in enumerate(members):
+            filename = os.path.basename(member.filename)
+            if n >= max_files:
+                yield filename, None, f"More than {max_files} files in one upload"
+                continue
+            if member.file_size > max_bytes:
+                yield filename, None, f"{filename} is larger than {max_bytes // (1024 * 1024)} MB"
+                continue
+            try:
+                with archive.open(member) as stream:
+                    yield filename, write_stream(stream, directory, filename, max_bytes), None
+            except (UploadTooLarge, zipfile.BadZipFile) as e:
+                yield filename, None, str(e)
+
+
+class MultipartReceiver:
+    # Parses a multipart/form-data body as it arrives and writes every file
+    # part straight to disk, so uploads are never spooled and copied again.
+    # Finished parts are collected in `files` as (filename, writer or None, error)
+
+    def __init__(self, content_type: str, directory: str, max_bytes: int, max_files: int):
+        content_type, params = parse_options_header(content_type)
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise ValueError("Expected a multipart/form-data body")
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.files = []
+        self._count = 0
+        self._headers = {}
+        self._field = b""
+        self._value = b""
+        self._writer = None
+        self._filename = None
+        self._error = None
+
+        self.parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end
+        })
+
+    def feed(self, data: bytes):
+        self.parser.write(data)
+
+    def close(self):
+        self.parser.finalize()
+
+    def abort(self):
+        # Removes the part in progress and finished files not yet collected
+        if self._writer is not None:
+            self._writer.discard()
+            self._writer = None
+        for _, writer, _ in self.files:
+            if writer is not None:
+                writer.discard()
+        self.files = []
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._field = b""
+        self._value = b""
+        self._writer = None
+        self._filename = None
+        self._error = None
+
+    def _on_header_field(self, data, start, end):
+        self._field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field = b""
+        self._value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if b"filename" not in options:
+            # Plain form fields are ignored, options are passed in the query
+            return
+
+        self._filename = options[b"filename"].decode("utf-8", "replace")
+        self._count += 1
+        if self._count > self.max_files:
+            self._error = f"More than {self.max_files} files in one upload"
+        else:
+            self._writer = UploadWriter(self.directory, self._filename, self.max_bytes)
+
+    def _on_part_data(self, data, start, end):
+        if self._writer is None:
+            return
+        try:
+            self._writer.write(data[start:end])
+        except UploadTooLarge as e:
+            # Drop the rest of this part but keep reading the others
+            self._writer.discard()
+            self._writer = None
+            self._error = str(e)
+
+    def _on_part_end(self):
+        if self._filename is None:
+            return
+        if self._writer is not None:
+            self._writer.finish()
+        self.files.append((self._filename, self._writer, self._error))
+        self._writer = None
+        self._filename = None
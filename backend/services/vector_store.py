@@ -1,33 +1,157 @@
-import chromadb
 import os
+import sqlite3
+import threading
+import numpy as np
 
-class Storage:
+from services.hashing import hash_text
+from services.storage_base import BaseStorage, DocumentTable, lock_directory
 
-    def __init__(self):
+class Storage(BaseStorage):
+
+    def __init__(self, path: str = "./chroma_db", collection_name: str = "documents"):
+        super().__init__()
+        self.path = path
+        self.collection_name = collection_name
         self.client = None
         self.collection = None
+        self.conn = None
+        self.documents = None
+        self.hnsw = {}
+        self._lock = threading.Lock()
 
-    def initialize_database(self):
+    def initialize_database(self, hnsw: dict = None):
+        # hnsw takes "M", "construction_ef" and "search_ef", unset keys keep
+        # Chroma's defaults. M and construction_ef only apply when the
+        # collection is created, search_ef is also applied to an existing one
+        # since the index is not loaded until the first query
         if self.client is None:
-            os.makedirs("./chroma_db", exist_ok=True)
-            self.client = chromadb.PersistentClient(path="./chroma_db")
+            self.hnsw = {k: v for k, v in (hnsw or {}).items() if v is not None}
+            import chromadb
+            lock_directory(self.path)
+            self.client = chromadb.PersistentClient(path=self.path)
             self.collection = self.client.get_or_create_collection(
-                name="documents",
-                metadata={"hnsw:space": "cosine"}
+                name=self.collection_name,
+                metadata=self.collection_metadata()
+            )
+            if "search_ef" in self.hnsw:
+                self.set_search_ef(self.hnsw["search_ef"])
+            # Chroma has no place for per-document records, they are kept
+            # in SQLite in the same directory
+            self.conn = sqlite3.connect(
+                os.path.join(self.path, f"{self.collection_name}.documents.sqlite3"), check_same_thread=False
             )
+            self.documents = DocumentTable(self.conn)
+            if self.documents.created and self.collection.count() > 0:
+                self.documents.rebuild(self._all_metadatas())
+            self.conn.commit()
             print("[Storage] ChromaDB connected")
 
-    def insert_chunks(self, texts: list[str], embeddings: list[list[float]]):
-        ids = [f"doc_{i}" for i in range(len(texts))]
-        self.collection.add(
-            documents=texts,
-            embeddings=embeddings,
-            ids=ids
-        )
-        print(f"[Storage] Inserted {len(texts)} chunks")
+    def collection_metadata(self) -> dict:
+        metadata = {"hnsw:space": "cosine"}
+        for key, value in self.hnsw.items():
+            metadata[f"hnsw:{key}"] = value
+        return metadata
+
+    def set_search_ef(self, search_ef: int):
+        # Saved with the collection, but an index this process has already
+        # loaded keeps the old value until the process restarts
+        self.collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+        self.hnsw["search_ef"] = search_ef
+
+    def insert_chunks(self, texts: list[str], embeddings: np.ndarray, ids: list[str] = None, metadatas: list[dict] = None):
+        if ids is None:
+            ids = [hash_text(text)[:32] for text in texts]
+        metadatas = metadatas or [None] * len(texts)
+
+        with self._lock:
+            # Chroma ignores ids that already exist, only new chunks are
+            # added to the document counts
+            existing = self.existing_ids(ids)
+            keep = []
+            for i, id_ in enumerate(ids):
+                if id_ not in existing:
+                    existing.add(id_)
+                    keep.append(i)
+            if not keep:
+                return
+
+            self.collection.add(
+                documents=[texts[i] for i in keep],
+                embeddings=np.asarray(embeddings, dtype=np.float32)[keep],
+                ids=[ids[i] for i in keep],
+                metadatas=[metadatas[i] for i in keep] if any(metadatas) else None
+            )
+            self.documents.add([metadatas[i] for i in keep])
+            self.conn.commit()
+            self.version += 1
+        print(f"[Storage] Inserted {len(keep)} chunks")
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def existing_ids(self, ids: list[str]) -> set:
+        if not ids:
+            return set()
+        return set(self.collection.get(ids=ids, include=[])["ids"])
+
+    def has_document(self, document_id: str) -> bool:
+        with self._lock:
+            return self.documents.get(document_id) is not None
+
+    def is_complete(self, document_id: str) -> bool:
+        with self._lock:
+            document = self.documents.get(document_id)
+        return document is not None and document["complete"]
+
+    def mark_complete(self, document_id: str):
+        with self._lock:
+            self.documents.mark_complete(document_id)
+            self.conn.commit()
+
+    def list_documents(self) -> list[dict]:
+        with self._lock:
+            return self.documents.list()
+
+    def _all_metadatas(self) -> list[dict]:
+        # Read in pages so large collections are not loaded in one call
+        metadatas = []
+        offset = 0
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=5000, offset=offset)["metadatas"]
+            metadatas.extend(page)
+            if len(page) < 5000:
+                break
+            offset += len(page)
+        return metadatas
+
+    def delete_document(self, document_id: str) -> int:
+        with self._lock:
+            ids = self.collection.get(where={"document_id": document_id}, include=[])["ids"]
+            for i in range(0, len(ids), 5000):
+                self.collection.delete(ids=ids[i:i + 5000])
+            self.documents.remove(document_id)
+            self.conn.commit()
+            if ids:
+                self.version += 1
+        if ids:
+            print(f"[Storage] Deleted {len(ids)} chunks of {document_id[:16]}")
+        return len(ids)
+
+    def clear(self):
+        with self._lock:
+            self.client.delete_collection(name=self.collection_name)
+            self.collection = self.client.get_or_create_collection(
+                name=self.collection_name,
+                metadata=self.collection_metadata()
+            )
+            self.documents.clear()
+            self.conn.commit()
+            self.version += 1
+        print("[Storage] Collection cleared")
 
-    def query(self, query_embedding, top_k=3):
+    def query(self, query_embedding, top_k=3, where: dict = None):
         return self.collection.query(
-            query_embeddings=query_embedding,
-            n_results=top_k
+            query_embeddings=np.asarray(query_embedding, dtype=np.float32),
+            n_results=top_k,
+            where=where
         )
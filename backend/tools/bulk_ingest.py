@@ -0,0 +1,260 @@
+"""
+Ingests a directory tree of PDFs straight into the vector store, without
+going through the API.
+
+    cd backend
+    python -m tools.bulk_ingest /archive/pdfs --workers 4 --embedding-workers 4
+
+Progress is appended to a checkpoint file, so an interrupted run picks up
+where it stopped when started again with the same checkpoint. Files already
+in the index are skipped. Storage settings default to the API's environment
+variables (VECTOR_BACKEND, VECTOR_SHARDS, VECTOR_SHARD_KEY, EMBEDDING_CACHE_PATH,
+MODEL_CACHE_DIR), so running it from the server's directory fills the
+server's index. Stop the server first: a store can only be open in one
+process, and the tool exits with an error while the server holds it.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.pdf_loader import PDFLoader
+from services.preprocess import Preprocess
+from services.embeddings import EmbeddingService
+from services.embedding_pool import EmbeddingPool
+from services.embedding_cache import EmbeddingCache
+from services.storage_base import create_storage
+from services.ingestion import IngestionPipeline
+from services.hashing import hash_file
+from services.jobs import Job
+
+class Checkpoint:
+    # Append-only JSON lines, the last record for a path wins. A file is
+    # marked "started" before ingestion and "done" or "failed" after it
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short by a crash
+                        continue
+                    self.records[record["path"]] = record
+        self._file = open(path, "a", encoding="utf-8")
+
+    def is_done(self, path: str, size: int, mtime: float) -> bool:
+        record = self.records.get(path)
+        return (
+            record is not None and record["status"] == "done"
+            and record["size"] == size and record["mtime"] == mtime
+        )
+
+    def unfinished(self, path: str):
+        # The record of a run that stopped or failed part way, if any
+        record = self.records.get(path)
+        if record is not None and record["status"] != "done":
+            return record
+        return None
+
+    def write(self, **record):
+        with self._lock:
+            self.records[record["path"]] = record
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+class Progress:
+    # Totals across finished and running files for throughput reports
+
+    def __init__(self, total_files: int):
+        self.total_files = total_files
+        self.files_done = 0
+        self.files_skipped = 0
+        self.files_failed = 0
+        self.jobs = []
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, job: Job):
+        with self._lock:
+            self.jobs.append(job)
+
+    def report(self) -> str:
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        with self._lock:
+            jobs = list(self.jobs)
+        pages = sum(job.pages_done for job in jobs)
+        chunks = sum(job.chunks_done for job in jobs)
+        embedded = sum(job.chunks_done - job.chunks_skipped - job.chunks_cached for job in jobs)
+        removed = sum(job.chars_removed for job in jobs)
+        finished = self.files_done + self.files_skipped + self.files_failed
+        return (
+            f"[BulkIngest] {finished}/{self.total_files} files "
+            f"({self.files_skipped} skipped, {self.files_failed} failed) | "
+            f"{pages} pages, {pages / elapsed:.1f} pages/s | "
+            f"{chunks} chunks, {chunks / elapsed:.1f} chunks/s ({embedded} embedded) | "
+            f"{removed} boilerplate chars stripped | "
+            f"{elapsed:.0f}s"
+        )
+
+def find_pdfs(root: str) -> list[str]:
+    return sorted(
+        os.path.relpath(os.path.join(directory, name), root)
+        for directory, _, files in os.walk(root) for name in files if name.lower().endswith(".pdf")
+    )
+
+def ingest_file(root, relative, pipeline, storage, checkpoint, progress, args):
+    path = os.path.join(root, relative)
+    stat = os.stat(path)
+    if checkpoint.is_done(relative, stat.st_size, stat.st_mtime):
+        return "skipped"
+
+    document_id = hash_file(path)
+    record = {"path": relative, "size": stat.st_size, "mtime": stat.st_mtime, "document_id": document_id}
+
+    # A file whose last run stopped or failed may be indexed only in part,
+    # drop what it stored and ingest it again from the start
+    unfinished = checkpoint.unfinished(relative)
+    if unfinished is not None:
+        storage.delete_document(unfinished["document_id"])
+        if unfinished["document_id"] != document_id:
+            storage.delete_document(document_id)
+    elif storage.is_complete(document_id):
+        checkpoint.write(**record, status="done", chunks=None)
+        return "skipped"
+
+    checkpoint.write(**record, status="started")
+    job = Job(relative, path, args.chunk_tokens, args.overlap_tokens, document_id, metadata=args.metadata)
+    progress.add(job)
+    try:
+        with job.timed("total"):
+            pipeline.run(job)
+    except Exception as e:
+        checkpoint.write(**record, status="failed", error=str(e))
+        print(f"[BulkIngest] {relative} failed: {e}")
+        return "failed"
+
+    checkpoint.write(**record, status="done", chunks=job.chunks_done)
+    return "done"
+
+def report_loop(progress: Progress, interval: float, stop: threading.Event):
+    while not stop.wait(interval):
+        print(progress.report(), flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk PDF ingestion")
+    parser.add_argument("directory", help="Directory searched recursively for PDFs")
+    parser.add_argument("--checkpoint", default="bulk_ingest.checkpoint.jsonl")
+    parser.add_argument("--workers", type=int, default=2, help="Files ingested at the same time")
+    parser.add_argument("--embedding-workers", type=int, default=os.cpu_count() or 1,
+                        help="Embedding processes, 0 embeds in this process")
+    parser.add_argument("--embedding-batch-size", type=int, default=16)
+    parser.add_argument("--extract-workers", type=int, default=None, help="Processes per file for text extraction")
+    parser.add_argument("--chunk-tokens", type=int, default=500)
+    parser.add_argument("--overlap-tokens", type=int, default=80)
+    parser.add_argument("--model", default="BAAI/bge-small-en-v1.5")
+    parser.add_argument("--backend", default=os.getenv("VECTOR_BACKEND", "chroma"))
+    parser.add_argument("--shards", type=int, default=int(os.getenv("VECTOR_SHARDS", "1")))
+    parser.add_argument("--shard-key", default=os.getenv("VECTOR_SHARD_KEY", "document_id"))
+    parser.add_argument("--embedding-cache", default=os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache/embeddings.sqlite3"),
+                        help="SQLite embedding cache, empty to disable")
+    parser.add_argument("--clear", action="store_true",
+                        help="Empty the index and start a new checkpoint, e.g. after changing the model")
+    parser.add_argument("--metadata", type=json.loads, default=None,
+                        help='JSON object stored on every chunk, e.g. \'{"tenant": "acme"}\' with VECTOR_SHARD_KEY=tenant')
+    parser.add_argument("--report-interval", type=float, default=10.0)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"{args.directory} is not a directory")
+    if not 0 < args.chunk_tokens <= 510 or not 0 <= args.overlap_tokens < args.chunk_tokens:
+        parser.error("chunk_tokens must be between 1 and 510 and larger than overlap_tokens")
+    if args.metadata is not None and not isinstance(args.metadata, dict):
+        parser.error("metadata must be a JSON object")
+
+    embedder = EmbeddingService(model_name=args.model, cache_dir=os.getenv("MODEL_CACHE_DIR", "./model_cache"))
+    embedder.load_model()
+    storage = create_storage(args.backend, shards=args.shards, shard_key=args.shard_key)
+    storage.initialize_database(hnsw={
+        "M": int(os.environ["HNSW_M"]) if "HNSW_M" in os.environ else None,
+        "construction_ef": int(os.environ["HNSW_CONSTRUCTION_EF"]) if "HNSW_CONSTRUCTION_EF" in os.environ else None,
+        "search_ef": int(os.environ["HNSW_SEARCH_EF"]) if "HNSW_SEARCH_EF" in os.environ else None
+    })
+    embedding_cache = None
+    if args.embedding_cache:
+        embedding_cache = EmbeddingCache(args.embedding_cache)
+        embedding_cache.initialize()
+    embedding_pool = None
+    if args.embedding_workers > 0:
+        embedding_pool = EmbeddingPool(
+            args.model, cache_dir=embedder.cache_dir,
+            workers=args.embedding_workers, batch_size=args.embedding_batch_size
+        )
+        embedding_pool.warmup()
+
+    if args.clear:
+        storage.clear()
+        if os.path.exists(args.checkpoint):
+            os.remove(args.checkpoint)
+
+    loader = PDFLoader(workers=args.extract_workers)
+    pipeline = IngestionPipeline(
+        loader, Preprocess(), embedder, storage, embedding_cache,
+        chunk_tokens=args.chunk_tokens, overlap_tokens=args.overlap_tokens, embedding_pool=embedding_pool
+    )
+    checkpoint = Checkpoint(args.checkpoint)
+    files = find_pdfs(args.directory)
+    progress = Progress(len(files))
+    print(f"[BulkIngest] {len(files)} PDFs found, checkpoint {args.checkpoint}")
+
+    stop = threading.Event()
+    reporter = threading.Thread(target=report_loop, args=(progress, args.report_interval, stop), daemon=True)
+    reporter.start()
+
+    pool = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="bulk")
+    try:
+        futures = [
+            pool.submit(ingest_file, args.directory, relative, pipeline, storage, checkpoint, progress, args)
+            for relative in files
+        ]
+        for future in as_completed(futures):
+            status = future.result()
+            if status == "done":
+                progress.files_done += 1
+            elif status == "skipped":
+                progress.files_skipped += 1
+            else:
+                progress.files_failed += 1
+    except KeyboardInterrupt:
+        print("[BulkIngest] Interrupted, run again to resume")
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise SystemExit(130)
+    finally:
+        stop.set()
+        pool.shutdown(wait=True)
+        loader.shutdown()
+        if embedding_pool is not None:
+            embedding_pool.shutdown()
+        if embedding_cache is not None:
+            embedding_cache.close()
+        checkpoint.close()
+
+    print(progress.report())
+    if progress.files_failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Measures recall@k against exact search and query latency for a grid of
+HNSW settings.
+
+    cd backend
+    python -m tools.tune_hnsw --corpus data/pdfs --queries queries.txt \\
+        --m 8 16 32 --construction-ef 100 200 --search-ef 10 50 100 200
+
+The corpus is a PDF, a directory of PDFs, or a .txt file with one chunk per
+line. Queries are a .txt file with one query per line.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import shutil
+import tempfile
+import numpy as np
+import chromadb
+from chromadb.api.client import SharedSystemClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.pdf_loader import PDFLoader
+from services.preprocess import Preprocess
+from services.embeddings import EmbeddingService
+
+def load_corpus(path: str, embedder: EmbeddingService, chunk_tokens: int, overlap_tokens: int) -> list[str]:
+    if path.endswith(".txt"):
+        with open(path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+
+    if os.path.isdir(path):
+        pdfs = sorted(
+            os.path.join(root, name)
+            for root, _, files in os.walk(path) for name in files if name.endswith(".pdf")
+        )
+    else:
+        pdfs = [path]
+
+    loader = PDFLoader()
+    preprocess = Preprocess()
+    chunks = []
+    for pdf in pdfs:
+        # Same cleanup as ingestion, so the tuning corpus matches the index
+        pages = (
+            (n, preprocess.clean_text(text))
+            for n, text, _ in preprocess.strip_boilerplate(loader.iter_pages(pdf))
+        )
+        for chunk, _, _ in preprocess.chunk_pages(pages, chunk_tokens, overlap_tokens, embedder.token_spans):
+            chunks.append(chunk)
+    loader.shutdown()
+    return chunks
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return top
+
+def percentile_ms(samples: list[float], q: float) -> float:
+    return float(np.percentile(samples, q) * 1000)
+
+def measure(collection, corpus, queries, truth, k):
+    # One query first so loading the index is not timed
+    collection.query(query_embeddings=queries[:1], n_results=k, include=[])
+    latencies = []
+    hits = 0
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        found = collection.query(query_embeddings=query[np.newaxis], n_results=k, include=[])
+        latencies.append(time.perf_counter() - start)
+        hits += len({int(x) for x in found["ids"][0]} & set(truth[i].tolist()))
+    return hits / (len(queries) * k), latencies
+
+def run_grid(corpus, queries, truth, args):
+    # The index copies live in a temporary directory removed at the end,
+    # also when a run fails or is interrupted
+    path = tempfile.mkdtemp(prefix="hnsw_tuning_")
+    try:
+        return measure_grid(path, corpus, queries, truth, args)
+    finally:
+        SharedSystemClient.clear_system_cache()
+        shutil.rmtree(path, ignore_errors=True)
+
+def measure_grid(path, corpus, queries, truth, args):
+    client = chromadb.PersistentClient(path=path)
+    ids = [str(i) for i in range(len(corpus))]
+    results = []
+
+    for m in args.m:
+        for construction_ef in args.construction_ef:
+            # One index per M and construction_ef. Chroma keeps a loaded
+            # index's search_ef until the process restarts, but a collection
+            # modified before its index is loaded uses the new value, so each
+            # search_ef reopens the collection in a fresh client
+            name = f"tune_m{m}_ef{construction_ef}"
+            collection = client.create_collection(
+                name=name,
+                metadata={
+                    "hnsw:space": "cosine",
+                    "hnsw:M": m,
+                    "hnsw:construction_ef": construction_ef
+                }
+            )
+
+            start = time.perf_counter()
+            for i in range(0, len(corpus), 5000):
+                collection.add(ids=ids[i:i + 5000], embeddings=corpus[i:i + 5000])
+            build_seconds = time.perf_counter() - start
+
+            for search_ef in args.search_ef:
+                SharedSystemClient.clear_system_cache()
+                client = chromadb.PersistentClient(path=path)
+                collection = client.get_collection(name)
+                collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+                recall, latencies = measure(collection, corpus, queries, truth, args.k)
+
+                row = {
+                    "M": m,
+                    "construction_ef": construction_ef,
+                    "search_ef": search_ef,
+                    f"recall@{args.k}": recall,
+                    "p50_ms": percentile_ms(latencies, 50),
+                    "p99_ms": percentile_ms(latencies, 99),
+                    "build_s": build_seconds
+                }
+                results.append(row)
+                print(
+                    f"M={m:<4} construction_ef={construction_ef:<5} search_ef={search_ef:<5} "
+                    f"recall@{args.k}={recall:.4f} "
+                    f"p50={row['p50_ms']:.2f}ms p99={row['p99_ms']:.2f}ms build={build_seconds:.1f}s"
+                )
+
+            client.delete_collection(name)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW recall/latency tuning")
+    parser.add_argument("--corpus", required=True, help="PDF, directory of PDFs or .txt with one chunk per line")
+    parser.add_argument("--queries", required=True, help=".txt with one query per line")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--m", type=int, nargs="+", default=[16])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--chunk-tokens", type=int, default=500)
+    parser.add_argument("--overlap-tokens", type=int, default=80)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    embedder = EmbeddingService()
+    embedder.load_model()
+
+    chunks = load_corpus(args.corpus, embedder, args.chunk_tokens, args.overlap_tokens)
+    with open(args.queries, encoding="utf-8") as f:
+        query_texts = [line.strip() for line in f if line.strip()]
+    if len(chunks) < args.k:
+        parser.error(f"Corpus has {len(chunks)} chunks, fewer than k={args.k}")
+
+    print(f"Embedding {len(chunks)} chunks and {len(query_texts)} queries...")
+    corpus = embedder.generate_embeddings(chunks)
+    queries = embedder.generate_embeddings(query_texts)
+    truth = exact_top_k(corpus, queries, args.k)
+
+    results = run_grid(corpus, queries, truth, args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"chunks": len(chunks), "queries": len(query_texts), "k": args.k, "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Minimal OpenAI-compatible server for benchmarks and local testing.
+
+    python benchmarks/fake_llm.py --port 8100 --latency-ms 200 --token-ms 10
+
+Point the API at it with OPENROUTER_BASE_URL=http://127.0.0.1:8100/api/v1
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = "This is a synthetic answer produced by the fake LLM server for benchmarking the question answering path."
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.2
+    token_delay = 0.01
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"data": [
+                {"id": "fake/model", "context_length": 8192},
+                {"id": "fake/model-small", "context_length": 4096}
+            ]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": "not found"})
+            return
+
+        time.sleep(self.latency)
+        if not request.get("stream"):
+            self._send_json(200, {"choices": [{"message": {"role": "assistant", "content": ANSWER}}]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for token in ANSWER.split(" "):
+            chunk = {"choices": [{"delta": {"content": token + " "}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(self.token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+def start_fake_llm(port: int = 0, latency_ms: float = 200, token_ms: float = 10) -> ThreadingHTTPServer:
+    # Starts the server on a background thread, port 0 picks a free port
+    handler = type("Handler", (FakeLLMHandler,), {"latency": latency_ms / 1000, "token_delay": token_ms / 1000})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible LLM server")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--token-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    server = start_fake_llm(args.port, args.latency_ms, args.token_ms)
+    print(f"Fake LLM listening on http://127.0.0.1:{server.server_address[1]}/api/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
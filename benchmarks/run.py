@@ -0,0 +1,268 @@
+"""
+End-to-end benchmarks for the RAG API.
+
+    python benchmarks/run.py --docs 2 --pages 100 --queries 200 --concurrency 16 --output results.json
+
+Without --base-url a server is started on a free port in a temporary working
+directory, with a local fake LLM server behind /ask. Results are printed and,
+with --output, written as JSON so runs can be compared across commits.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_pdf import make_pdf, WORDS
+from fake_llm import start_fake_llm
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, "backend")
+
+_local = threading.local()
+
+def session() -> requests.Session:
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+def summarize(latencies: list[float], wall_seconds: float = None, **extra) -> dict:
+    samples = np.asarray(latencies) * 1000
+    summary = {
+        "count": len(latencies),
+        "mean_ms": float(samples.mean()) if len(samples) else 0.0,
+        "p50_ms": float(np.percentile(samples, 50)) if len(samples) else 0.0,
+        "p95_ms": float(np.percentile(samples, 95)) if len(samples) else 0.0,
+        "p99_ms": float(np.percentile(samples, 99)) if len(samples) else 0.0
+    }
+    if wall_seconds:
+        summary["throughput_per_s"] = len(latencies) / wall_seconds
+    summary.update(extra)
+    return summary
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(workdir: str, llm_url: str, timeout: float) -> tuple:
+    port = free_port()
+    env = dict(os.environ, OPENROUTER_BASE_URL=llm_url, ANONYMIZED_TELEMETRY="False")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND,
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env,
+        stdout=open(os.path.join(workdir, "server.log"), "w"), stderr=subprocess.STDOUT
+    )
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited, see {workdir}/server.log")
+        # /ready only answers 200 once the model and index are warm, so
+        # loading them is never part of a measurement
+        try:
+            response = requests.get(f"{base_url}/ready", timeout=1)
+            if response.status_code == 200:
+                return process, base_url
+            if "failed to start" in response.text:
+                process.terminate()
+                raise RuntimeError(f"Server warm-up failed: {response.json()['detail']}")
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.5)
+
+    process.terminate()
+    raise RuntimeError("Server did not become ready in time")
+
+def make_queries(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 8))) for _ in range(count)]
+
+def bench_upload(base_url: str, pdfs: list[str], pages: int) -> dict:
+    latencies = []
+    jobs = []
+    start = time.perf_counter()
+
+    for pdf in pdfs:
+        t0 = time.perf_counter()
+        with open(pdf, "rb") as f:
+            response = session().post(f"{base_url}/upload-pdf", files={"file": (os.path.basename(pdf), f, "application/pdf")})
+        response.raise_for_status()
+        job_id = response.json()["job_id"]
+
+        while True:
+            job = session().get(f"{base_url}/jobs/{job_id}").json()
+            if job["stage"] in ("done", "failed"):
+                break
+            time.sleep(0.05)
+        if job["stage"] == "failed":
+            raise RuntimeError(f"Ingestion failed: {job['error']}")
+
+        latencies.append(time.perf_counter() - t0)
+        jobs.append(job)
+
+    wall = time.perf_counter() - start
+    chunks = sum(job["chunks_done"] for job in jobs)
+    stage_seconds = {}
+    for job in jobs:
+        for stage, seconds in job["timings"].items():
+            stage_seconds[stage] = stage_seconds.get(stage, 0.0) + seconds
+
+    return summarize(
+        latencies, wall,
+        pages_per_s=pages * len(pdfs) / wall,
+        chunks_per_s=chunks / wall,
+        chunks=chunks,
+        stage_seconds=stage_seconds
+    )
+
+def bench_requests(fn, payloads: list, concurrency: int = 1) -> dict:
+    latencies = []
+
+    def timed(payload):
+        t0 = time.perf_counter()
+        fn(payload)
+        return time.perf_counter() - t0
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        latencies = [timed(payload) for payload in payloads]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(timed, payloads))
+    return summarize(latencies, time.perf_counter() - start, concurrency=concurrency)
+
+def post_json(base_url: str, path: str):
+    def call(payload):
+        response = session().post(f"{base_url}{path}", json=payload, timeout=120)
+        response.raise_for_status()
+        return response
+    return call
+
+def bench_ask_stream(base_url: str, payloads: list) -> dict:
+    first_token = []
+    totals = []
+    start = time.perf_counter()
+    for payload in payloads:
+        t0 = time.perf_counter()
+        seen_token = False
+        with session().post(f"{base_url}/ask/stream", json=payload, stream=True, timeout=120) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line == b"event: token" and not seen_token:
+                    first_token.append(time.perf_counter() - t0)
+                    seen_token = True
+        totals.append(time.perf_counter() - t0)
+
+    summary = summarize(totals, time.perf_counter() - start)
+    summary["time_to_first_token"] = summarize(first_token)
+    return summary
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+def print_stage(name: str, result: dict):
+    line = f"{name:<20} n={result['count']:<5} p50={result['p50_ms']:9.2f}ms p95={result['p95_ms']:9.2f}ms p99={result['p99_ms']:9.2f}ms"
+    if "throughput_per_s" in result:
+        line += f" {result['throughput_per_s']:9.2f}/s"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG API end-to-end benchmarks")
+    parser.add_argument("--base-url", help="Benchmark a running server instead of starting one")
+    parser.add_argument("--docs", type=int, default=2)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--words-per-page", type=int, default=350)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--asks", type=int, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--llm-token-ms", type=float, default=10)
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rag_bench_")
+    llm = start_fake_llm(0, args.llm_latency_ms, args.llm_token_ms)
+    llm_url = f"http://127.0.0.1:{llm.server_address[1]}/api/v1"
+
+    process = None
+    base_url = args.base_url
+    if base_url is None:
+        print(f"Starting server in {workdir}...")
+        process, base_url = start_server(workdir, llm_url, args.startup_timeout)
+
+    try:
+        pdfs = []
+        for i in range(args.docs):
+            path = os.path.join(workdir, f"synthetic_{args.seed}_{i}.pdf")
+            make_pdf(path, pages=args.pages, words_per_page=args.words_per_page, seed=args.seed + i)
+            pdfs.append(path)
+
+        stages = {}
+        stages["upload"] = bench_upload(base_url, pdfs, args.pages)
+        print_stage("upload", stages["upload"])
+
+        # Distinct query sets so the query and result caches do not hide the cost
+        search = post_json(base_url, "/search")
+        payloads = [{"query": q, "top_k": args.top_k} for q in make_queries(args.queries, args.seed)]
+        stages["search"] = bench_requests(search, payloads)
+        print_stage("search", stages["search"])
+
+        payloads = [{"query": q, "top_k": args.top_k} for q in make_queries(args.queries, args.seed + 1)]
+        stages["search_concurrent"] = bench_requests(search, payloads, args.concurrency)
+        print_stage("search_concurrent", stages["search_concurrent"])
+
+        ask_payloads = [
+            {"query": q, "top_k": args.top_k, "model": "fake/model", "api_key": "benchmark"}
+            for q in make_queries(args.asks * 2, args.seed + 2)
+        ]
+        stages["ask"] = bench_requests(post_json(base_url, "/ask"), ask_payloads[:args.asks])
+        print_stage("ask", stages["ask"])
+
+        stages["ask_stream"] = bench_ask_stream(base_url, ask_payloads[args.asks:])
+        print_stage("ask_stream", stages["ask_stream"])
+        print_stage("  first_token", stages["ask_stream"]["time_to_first_token"])
+
+        results = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": time.time(),
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+                "args": vars(args)
+            },
+            "stages": stages
+        }
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"Results written to {args.output}")
+
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        llm.shutdown()
+
+if __name__ == "__main__":
+    main()
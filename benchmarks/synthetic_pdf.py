@@ -0,0 +1,68 @@
+import random
+
+WORDS = (
+    "data system service request index vector query model token page chunk "
+    "document search result latency cache memory storage network process thread "
+    "python function class module package error value list string number file "
+    "client server upload answer context embedding database collection batch"
+).split()
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _page_lines(rng: random.Random, page_number: int, words_per_page: int, words_per_line: int = 12):
+    words = []
+    while len(words) < words_per_page:
+        sentence = [rng.choice(WORDS) for _ in range(rng.randint(6, 18))]
+        sentence[0] = sentence[0].capitalize()
+        sentence[-1] += "."
+        words.extend(sentence)
+
+    # A running header and footer, like real manuals have
+    yield "Synthetic Benchmark Manual"
+    for i in range(0, len(words), words_per_line):
+        yield " ".join(words[i:i + words_per_line])
+    yield f"Page {page_number}"
+
+def make_pdf(path: str, pages: int = 50, words_per_page: int = 350, seed: int = 0):
+    # Writes a plain PDF with Helvetica text that pypdf can extract
+    rng = random.Random(seed)
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")
+    pages_obj = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    kids = []
+    for page_number in range(1, pages + 1):
+        lines = [f"({_escape(line)}) '" for line in _page_lines(rng, page_number, words_per_page)]
+        stream = ("BT /F1 9 Tf 11 TL 40 800 Td\n" + "\n".join(lines) + "\nET").encode("latin-1")
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_obj, font, content)
+        ))
+
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_obj
+    objects[pages_obj - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+
+    with open(path, "wb") as f:
+        f.write(out)
@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import threading
+import time
 import requests
 import logging
 
@@ -207,10 +208,15 @@ class RAGClient:
             
             if response.status_code == 200:
                 data = response.json()
+                filename = data['filename']
+                
+                # Wait for the background ingestion job
+                job = self.wait_for_job(data['job_id'])
+                if job['stage'] == 'failed':
+                    raise Exception(job['error'])
                 
                 self.pdf_loaded = True
-                filename = data['filename']
-                chunks = data['chunks_count']
+                chunks = job['chunks_done']
                 
                 self.pdf_info_label.config(
                     text=f"✅ {filename} ({chunks} chunks)",
@@ -234,6 +240,17 @@ class RAGClient:
         finally:
             self.unlock_ui()
 
+    def wait_for_job(self, job_id):
+        while True:
+            job = requests.get(f"{self.api_base}/jobs/{job_id}", timeout=5).json()
+            if job['stage'] in ('done', 'failed'):
+                return job
+            
+            self.update_output(f"⏳ Processing PDF ({job['stage']})...\n" +
+                               f"  • Pages: {job['pages_done']}/{job['pages_total']}\n" +
+                               f"  • Chunks: {job['chunks_done']}\n")
+            time.sleep(1)
+
     def search_query(self):
         if not self.pdf_loaded:
             messagebox.showwarning("Warning", "⚠️ Upload a PDF first!")